@@ -0,0 +1,185 @@
+import csv
+import json
+import sys
+import unicodedata
+from decimal import Decimal, InvalidOperation
+import simplejson
+from portfolio.portfolio import Portfolio
+from market_data.market import Market, parse_composition
+from rebalancer.calculator import CreateCalculator, adjustment_action, available_methods
+
+# Output columns: (key, header, kind), kind is 'text', 'amount' or 'percent'
+ALLOCATION_COLUMNS = [
+    ('asset', 'Asset', 'text'),
+    ('value', 'Value', 'amount'),
+    ('percentage', 'Percentage', 'percent'),
+]
+
+ADJUSTMENT_COLUMNS = [
+    ('asset', 'Asset', 'text'),
+    ('current', 'Current %', 'percent'),
+    ('target', 'Target %', 'percent'),
+    ('end', 'End %', 'percent'),
+    ('adjustment', 'Adjustment', 'amount'),
+    ('adjustment_pct', 'Adjustment %', 'percent'),
+    ('action', 'Action', 'text'),
+    ('per_period', 'Per Period', 'amount'),
+    ('period', 'Period', 'text'),
+]
+
+REFRESH_COLUMNS = [
+    ('symbol', 'Symbol', 'text'),
+    ('kind', 'Kind', 'text'),
+    ('value', 'Value', 'text'),
+    ('update_at', 'Updated', 'text'),
+    ('status', 'Status', 'text'),
+]
+
+def allocation_rows(portfolio: Portfolio, merge: bool = False) -> list[dict]:
+    """Current allocation by ascending percentage, like the allocation tab."""
+    rows = [
+        {'asset': asset, 'value': value, 'percentage': value / portfolio.total_value * 100}
+        for asset, value in portfolio.current_allocation(merge=merge).items()
+    ]
+    return sorted(rows, key=lambda row: row['percentage'])
+
+def adjustment_rows(portfolio: Portfolio, target: str, duration: dict, method: str = 'standard') -> list[dict]:
+    """Adjustments of the calculator in its order, with the same figures as the adjustments tab."""
+    adjustments = CreateCalculator(portfolio, method, target).calculate_adjustments(duration)
+    current_pcts = portfolio.current_allocation(merge=True)
+    target_pcts = portfolio.target_percentages(selected=target)
+    period = 'day' if duration['unit'] == 'day' else 'week'
+    rows = []
+    for asset, [amount, end_pct] in adjustments.items():
+        current_pct = current_pcts[asset] / portfolio.total_value * 100 if asset in current_pcts else 0
+        if duration['unit'] == 'day':
+            per_period = amount / duration['value']
+        else:
+            per_period = amount / duration['value'] / (Decimal(365) / 7 / 12)
+        rows.append({
+            'asset': asset,
+            'current': current_pct,
+            'target': target_pcts.get(asset, 0),
+            'end': end_pct * 100,
+            'adjustment': amount,
+            'adjustment_pct': end_pct * 100 - current_pct,
+            'action': adjustment_action(asset, amount),
+            'per_period': abs(per_period),
+            'period': period,
+        })
+    return rows
+
+def refresh_rows(market: Market, symbols: list[str]) -> list[dict]:
+    rows = []
+    for symbol in symbols:
+        holding = market.data['holdings'].get(symbol)
+        if holding is None:
+            continue
+        if symbol in market.pending_compositions:
+            status = f"composition pending: {market.pending_compositions[symbol]['reason']}"
+        elif symbol in market.retry_schedule.entries:
+            entry = market.retry_schedule.entries[symbol]
+            status = f"retry at {entry['retry_at']}: {entry['reason']}"
+        else:
+            status = 'ok'
+        rows.append({'symbol': symbol, 'kind': holding['kind'], 'value': str(holding['value']), 'update_at': holding['update_at'], 'status': status})
+    return rows
+
+def print_rows(rows: list[dict], columns: list[tuple[str, str, str]], output_format: str = 'table', total: dict | None = None, file=None):
+    """Print rows as a table, CSV or JSON. Amounts are rounded to cents and percentages to 0.01% in every format."""
+    file = file or sys.stdout
+    rows = [{key: _round(row[key], kind) for key, _, kind in columns} for row in rows]
+    if output_format == 'json':
+        simplejson.dump(rows, file, ensure_ascii=False, indent=2)
+        file.write('\n')
+    elif output_format == 'csv':
+        writer = csv.writer(file)
+        writer.writerow([key for key, _, _ in columns])
+        writer.writerows([row[key] for key, _, _ in columns] for row in rows)
+    else:
+        lines = [[header for _, header, _ in columns]]
+        lines.extend([_format(row[key], kind) for key, _, kind in columns] for row in rows)
+        if total is not None:
+            lines.append([_format(total.get(key, ''), kind) for key, _, kind in columns])
+        widths = [max(_width(line[i]) for line in lines) for i in range(len(columns))]
+        for n, line in enumerate(lines):
+            cells = []
+            for (_, _, kind), cell, width in zip(columns, line, widths):
+                padding = ' ' * (width - _width(cell))
+                cells.append(padding + cell if kind != 'text' else cell + padding)
+            print('  '.join(cells).rstrip(), file=file)
+            if n == 0:
+                print('  '.join('-' * width for width in widths), file=file)
+
+def _round(value, kind: str):
+    if kind == 'text' or not isinstance(value, (Decimal, int)):
+        return value
+    return Decimal(value).quantize(Decimal('0.01'))
+
+def _format(value, kind: str) -> str:
+    if value == '' or kind == 'text':
+        return str(value)
+    if kind == 'percent':
+        return f"{value:.2f}%"
+    return f"{value:,.2f}"
+
+def _width(text: str) -> int:
+    # CJK characters take two columns in a terminal
+    return sum(2 if unicodedata.east_asian_width(char) in 'WF' else 1 for char in text)
+
+def parse_duration(value: str, unit: str) -> dict:
+    """A rebalance duration as the calculators take it, validated like the config tab does."""
+    try:
+        duration_value = Decimal(value)
+    except InvalidOperation:
+        raise ValueError("Duration must be a valid number")
+    if duration_value <= 0:
+        raise ValueError("Duration must be a positive number")
+    if unit == 'day' and duration_value != duration_value.to_integral_value():
+        raise ValueError("Duration in days must be an integer")
+    return {'value': duration_value, 'unit': unit}
+
+def run_allocation(args, logger):
+    portfolio = Portfolio(args.portfolio, args.market, logger)
+    rows = allocation_rows(portfolio, args.merge)
+    print_rows(rows, ALLOCATION_COLUMNS, args.format, total={'asset': 'Total', 'value': portfolio.total_value, 'percentage': Decimal(100)})
+
+def run_adjust(args, logger):
+    duration = parse_duration(args.duration, args.unit)
+    if args.method not in available_methods():
+        raise ValueError(f"Unknown calculator method {args.method}, available: {', '.join(available_methods())}")
+    portfolio = Portfolio(args.portfolio, args.market, logger)
+    target = args.target or portfolio.get_selected_target_percentage()
+    if target not in portfolio.get_target_percentage_configurations():
+        raise ValueError(f"Unknown target percentage configuration {target}, available: {', '.join(portfolio.get_target_percentage_configurations())}")
+    print_rows(adjustment_rows(portfolio, target, duration, args.method), ADJUSTMENT_COLUMNS, args.format)
+
+def run_refresh(args, logger):
+    market = Market(args.market, logger)
+    if args.all:
+        symbols = list(market.data['holdings'])
+    else:
+        with open(args.portfolio, 'r', encoding='utf-8') as f:
+            symbols = [holding['symbol'] for holding in json.load(f)['holdings']]
+    market.prefetch(symbols)
+    if args.resolve and market.pending_compositions:
+        resolve_compositions_interactively(market)
+    print_rows(refresh_rows(market, symbols), REFRESH_COLUMNS, args.format)
+
+def resolve_compositions_interactively(market: Market):
+    """Ask for the pending compositions on the terminal, like the composition dialog of the GUI."""
+    print("Enter new compositions as asset:percentage;asset:percentage. Leave empty to keep the current one.", file=sys.stderr)
+    compositions = {}
+    for symbol, pending in sorted(market.pending_compositions.items()):
+        composition = market.data['holdings'][symbol]['composition']
+        current = ';'.join(f"{asset}:{percentage}" for asset, percentage in composition.items() if asset != 'update_at')
+        print(f"{symbol}: {pending['reason']} Current: {current}", file=sys.stderr)
+        while True:
+            try:
+                # the prompt goes to stderr too, stdout only carries the output
+                print(f"New composition of {symbol}: ", end='', file=sys.stderr, flush=True)
+                compositions[symbol] = parse_composition(input())
+                break
+            except (ValueError, InvalidOperation):
+                print(f"Invalid composition for {symbol}.", file=sys.stderr)
+    market.resolve_compositions(compositions)
@@ -0,0 +1,71 @@
+import tkinter as tk
+from tkinter import ttk, messagebox
+from decimal import InvalidOperation
+from market_data.market import Market, parse_composition
+
+class CompositionDialog:
+    def __init__(self, parent, market: Market, on_resolved=None):
+        """Dialog to enter the compositions waiting in market.pending_compositions, all at once."""
+        self.parent = parent
+        self.market = market
+        self.on_resolved = on_resolved
+        self.entries = {}
+        self.create_dialog()
+
+    def create_dialog(self):
+        """Create the dialog with one row per pending symbol."""
+        self.popup = tk.Toplevel(self.parent)
+        self.popup.title("Pending Composition Updates")
+        self.popup.transient(self.parent.winfo_toplevel())
+
+        ttk.Label(
+            self.popup,
+            text="Enter new compositions as asset:percentage;asset:percentage. Leave empty to keep the current one."
+        ).pack(padx=10, pady=(10, 5), anchor=tk.W)
+
+        rows_frame = ttk.Frame(self.popup)
+        rows_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        headers = ["Symbol", "Reason", "Current", "New Composition"]
+        for col, header in enumerate(headers):
+            ttk.Label(rows_frame, text=header, font=('Arial', 10, 'bold')).grid(row=0, column=col, padx=5, pady=3, sticky="w")
+
+        for i, (symbol, pending) in enumerate(sorted(self.market.pending_compositions.items()), start=1):
+            composition = self.market.data['holdings'][symbol]['composition']
+            current = ';'.join(f"{asset}:{percentage}" for asset, percentage in composition.items() if asset != 'update_at')
+            ttk.Label(rows_frame, text=symbol).grid(row=i, column=0, padx=5, pady=3, sticky="w")
+            ttk.Label(rows_frame, text=pending['reason']).grid(row=i, column=1, padx=5, pady=3, sticky="w")
+            ttk.Label(rows_frame, text=current).grid(row=i, column=2, padx=5, pady=3, sticky="w")
+            entry = ttk.Entry(rows_frame, width=40)
+            entry.grid(row=i, column=3, padx=5, pady=3)
+            self.entries[symbol] = entry
+
+        btn_frame = ttk.Frame(self.popup)
+        btn_frame.pack(fill=tk.X, padx=10, pady=10)
+
+        ttk.Button(btn_frame, text="Apply All", command=self.apply).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(btn_frame, text="Later", command=self.popup.destroy).pack(side=tk.RIGHT, padx=5)
+
+        # Handle Escape key
+        self.popup.bind("<Escape>", lambda event: self.popup.destroy())
+
+    def apply(self):
+        """Parse every entry and resolve all pending compositions in one batch."""
+        compositions = {}
+        for symbol, entry in self.entries.items():
+            try:
+                compositions[symbol] = parse_composition(entry.get())
+            except (ValueError, InvalidOperation):
+                messagebox.showerror("Invalid Composition", f"Invalid composition for {symbol}.", parent=self.popup)
+                return
+        try:
+            self.market.resolve_compositions(compositions)
+        except (ValueError, AssertionError) as e:
+            messagebox.showerror("Invalid Composition", f"Failed to update compositions: {e}", parent=self.popup)
+            return
+        self.popup.destroy()
+        if self.on_resolved is not None:
+            self.on_resolved()
+
+    def is_open(self) -> bool:
+        return self.popup.winfo_exists()
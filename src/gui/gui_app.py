@@ -1,23 +1,35 @@
 import tkinter as tk
-from tkinter import ttk
+from tkinter import ttk, messagebox
 from portfolio.portfolio import Portfolio
-from gui.tabs.allocation_tab import AllocationTab
-from gui.tabs.config_tab import ConfigurationTab
-from gui.tabs.adjustments_tab import AdjustmentsTab
-from gui.tabs.accounting_tab import AccountingTab
+from gui.composition_dialog import CompositionDialog
+from gui.task_runner import TaskRunner
+
+# Tabs in notebook order, each built on first selection: (title, attribute of the tab object)
+TABS = [
+    ("Accounting", 'accounting_tab'),
+    ("Current Allocation", 'allocation_tab'),
+    ("Configuration", 'config_tab'),
+    ("Rebalancing Adjustments", 'adjustments_tab'),
+]
 
 class PortfolioRebalancerGUI:
-    def __init__(self, root, portfolio: Portfolio):
-        """Initialize the GUI application."""
+    def __init__(self, root, load_portfolio):
+        """
+        Initialize the GUI application.
+        load_portfolio returns the Portfolio, it is called on the task runner after the window is shown,
+        since loading it may have to fetch market data.
+        """
         self.root = root
-        self.portfolio = portfolio
+        self.portfolio: Portfolio | None = None
+        self.tabs = {}
 
         self.update_window_title()
         self.root.geometry("900x600")
         self.root.minsize(800, 500)
 
-        # Track window state
-        self.window_state = self.root.state()
+        # Track window size, the charts are laid out again once resizing settles
+        self.window_size = None
+        self.resize_job = None
         self.root.bind("<Configure>", self.on_window_configure)
         
         # Add keyboard bindings for tab navigation
@@ -25,26 +37,71 @@ class PortfolioRebalancerGUI:
         self.root.bind("<Control-Shift-Tab>", self.previous_tab)
         self.root.bind("<Control-t>", self.toggle_market_price_mode)
 
-        self.setup_ui()
+        self.composition_dialog = None
+        self.prompted_compositions = set()
 
-    def on_window_configure(self, event):
-        """Handle window configure events to detect window state changes."""
-        # Get current window state
-        current_state = self.root.state()
+        # Status bar for the background tasks, Escape cancels the running one
+        self.status_var = tk.StringVar(value="Ready")
+        status_bar = ttk.Label(self.root, textvariable=self.status_var, anchor=tk.W, relief=tk.SUNKEN)
+        status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+        # fetching and computing runs on a worker thread, a new pending composition is asked for after each task
+        self.task_runner = TaskRunner(self.root, on_status=self.status_var.set, on_finished=self.check_pending_compositions)
+        self.root.bind("<Escape>", self.task_runner.cancel)
+
+        # Show the window right away, the tabs are set up once the portfolio is loaded
+        self.loading_label = ttk.Label(self.root, text="Loading portfolio...", anchor=tk.CENTER)
+        self.loading_label.pack(fill=tk.BOTH, expand=True)
+        self.task_runner.submit("Loading portfolio", lambda task: load_portfolio(), self.on_portfolio_loaded, self.on_portfolio_load_error)
 
-        # If state changed from normal to zoomed (maximized)
-        if current_state == 'zoomed' and self.window_state != 'zoomed':
-            self.refresh_current_tab(resize=True)
+    def on_portfolio_load_error(self, error):
+        self.loading_label.configure(text="Failed to load the portfolio.")
+        messagebox.showerror("Load Error", f"Failed to load the portfolio: {error}")
+
+    def on_portfolio_loaded(self, portfolio: Portfolio):
+        self.portfolio = portfolio
+        self.loading_label.destroy()
+        self.update_window_title()
+        self.setup_ui()
 
-        # If state changed from zoomed (maximized) to normal
-        elif current_state != 'zoomed' and self.window_state == 'zoomed':
-            self.refresh_current_tab(resize=True)
+    def check_pending_compositions(self):
+        """Open the composition dialog when there are pending compositions the user has not been asked about."""
+        if self.portfolio is None:
+            return
+        pending = set(self.portfolio.market.pending_compositions)
+        if not pending - self.prompted_compositions:
+            return
+        if self.composition_dialog is not None and self.composition_dialog.is_open():
+            return
+        self.prompted_compositions |= pending
+        self.composition_dialog = CompositionDialog(self.root, self.portfolio.market, self.refresh_current_tab)
 
-        # Update the saved state
-        self.window_state = current_state
+    def on_window_configure(self, event):
+        """Handle window configure events, a resize (including maximize and restore) relayouts the current chart once it settles."""
+        # the binding on root also receives the events of every child widget
+        if event.widget is not self.root:
+            return
+        size = (event.width, event.height)
+        if size == self.window_size:
+            return
+        self.window_size = size
+        if self.resize_job is not None:
+            self.root.after_cancel(self.resize_job)
+        self.resize_job = self.root.after(200, self.relayout_current_tab)
+
+    def relayout_current_tab(self):
+        """Fit the chart of the current tab to the window size, the data is not refreshed."""
+        self.resize_job = None
+        if self.portfolio is None:
+            return
+        tab = self.tabs.get(self.notebook.index(self.notebook.select()))
+        chart = getattr(tab, 'chart', None)
+        if chart is not None:
+            chart.relayout()
     
     def next_tab(self, event=None):
         """Switch to the next tab."""
+        if self.portfolio is None:
+            return "break"
         current_tab = self.notebook.index(self.notebook.select())
         next_tab = (current_tab + 1) % self.notebook.index("end")
         self.notebook.select(next_tab)
@@ -52,62 +109,86 @@ class PortfolioRebalancerGUI:
         
     def previous_tab(self, event=None):
         """Switch to the previous tab."""
+        if self.portfolio is None:
+            return "break"
         current_tab = self.notebook.index(self.notebook.select())
         prev_tab = (current_tab - 1) % self.notebook.index("end")
         self.notebook.select(prev_tab)
         return "break"  # Prevent default behavior
 
-    def refresh_current_tab(self, event=None, resize=False):
-        """Refresh only the currently active tab."""
+    def refresh_current_tab(self, event=None):
+        """Refresh only the currently active tab, building it if it is shown for the first time."""
+        if self.portfolio is None:
+            return
         current_tab_index = self.notebook.index(self.notebook.select())
-
-        if current_tab_index == 1 and hasattr(self, 'allocation_tab'):  # Allocation tab
-            self.root.after(75, self.allocation_tab.refresh_view)
+        if current_tab_index not in self.tabs:
+            # every tab loads the current data when it is created
+            self.build_tab(current_tab_index)
+        elif current_tab_index == 1:  # Allocation tab, refreshed on the task runner
+            self.allocation_tab.refresh_view()
         elif current_tab_index == 2:  # Configuration tab
             self.root.after(75, self.config_tab.refresh_view)
-        elif not resize and current_tab_index == 3:  # no need to refresh when size for Adjustments tab
+        elif current_tab_index == 3:  # Adjustments tab, refreshed on the task runner
             self.adjustments_tab.refresh_view()
+        self.root.after(100, self.check_pending_compositions)
 
     def update_window_title(self):
         title = "Portfolio Rebalancer"
-        if self.portfolio.market.market_price_mode:
+        if self.portfolio is not None and self.portfolio.market.market_price_mode:
             title += " (Market Price)"
         self.root.title(title)
 
     def setup_ui(self):
-        """Set up the user interface."""
+        """Set up the user interface, the tabs themselves are built when first selected (see build_tab)."""
         # Create a notebook (tabbed interface)
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
+        self.tab_frames = []
+        for title, _ in TABS:
+            frame = ttk.Frame(self.notebook)
+            self.notebook.add(frame, text=title)
+            self.tab_frames.append(frame)
+
         # Bind tab change event
         self.notebook.bind("<<NotebookTabChanged>>", self.refresh_current_tab)
+        self.build_tab(self.notebook.index(self.notebook.select()))
+
+    def build_tab(self, index: int):
+        """Create the tab at index, its module (and matplotlib for the chart tabs) is imported here on first use."""
+        frame = self.tab_frames[index]
+        if index == 0:
+            from gui.tabs.accounting_tab import AccountingTab
+            tab = AccountingTab(frame, self.portfolio)
+        elif index == 1:
+            from gui.tabs.allocation_tab import AllocationTab
+            tab = AllocationTab(frame, self.portfolio, self.task_runner)
+        elif index == 2:
+            from gui.tabs.config_tab import ConfigurationTab
+            tab = ConfigurationTab(frame, self.portfolio)
+        else:
+            from gui.tabs.adjustments_tab import AdjustmentsTab
+            # the rebalance duration and target are set on the configuration tab
+            config_tab = self.get_tab(2)
+            tab = AdjustmentsTab(frame, self.portfolio, self.task_runner, config_tab.get_rebalance_duration, config_tab.get_selected_target_percentage)
+        self.tabs[index] = tab
+        setattr(self, TABS[index][1], tab)
+        return tab
+
+    def get_tab(self, index: int):
+        return self.tabs[index] if index in self.tabs else self.build_tab(index)
 
-        # Create accounting tab
-        accounting_frame = ttk.Frame(self.notebook)
-        self.notebook.add(accounting_frame, text="Accounting")
-        self.accounting_tab = AccountingTab(accounting_frame, self.portfolio)
-
-        # Create allocation tab
-        allocation_frame = ttk.Frame(self.notebook)
-        self.notebook.add(allocation_frame, text="Current Allocation")
-        self.allocation_tab = AllocationTab(allocation_frame, self.portfolio)
-
-        # Create configuration tab
-        config_frame = ttk.Frame(self.notebook)
-        self.notebook.add(config_frame, text="Configuration")
-        self.config_tab = ConfigurationTab(
-            config_frame,
-            self.portfolio
+    def toggle_market_price_mode(self, event=None):
+        if self.portfolio is None:
+            return "break"
+        # not coalesced, every toggle counts
+        self.task_runner.submit(
+            "Fetching market prices",
+            lambda task: self.portfolio.toggle_market_price_mode(task.cancel, task.progress),
+            self.on_market_price_mode_toggled,
         )
+        return "break"
 
-        # Create adjustments tab
-        adjustments_frame = ttk.Frame(self.notebook)
-        self.notebook.add(adjustments_frame, text="Rebalancing Adjustments")
-        self.adjustments_tab = AdjustmentsTab(adjustments_frame, self.portfolio, self.config_tab.get_rebalance_duration, self.config_tab.get_selected_target_percentage)
-
-    def toggle_market_price_mode(self, event=None):
-        self.portfolio.toggle_market_price_mode()
+    def on_market_price_mode_toggled(self, result):
         self.update_window_title()
         self.refresh_current_tab()
-        return "break"
@@ -0,0 +1,91 @@
+import math
+import tkinter as tk
+
+# Font that supports Chinese characters
+FONT = {'family': 'Microsoft YaHei', 'size': 9}
+
+class PieChart:
+    """
+    Pie chart with a legend in a Tk widget, matplotlib is imported when the first one is created.
+
+    update() keeps the wedge, label and legend artists of the last full render: new values for the same labels
+    only move them, the same data is not drawn again, and only new labels rebuild the chart.
+    Drawing goes through draw_idle, so several updates within one event loop iteration render once.
+    """
+
+    def __init__(self, master, title: str, startangle: float = 90, labeldistance: float = 1.1, pctdistance: float = 0.6):
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.figure import Figure
+        self.title = title
+        self.startangle = startangle
+        self.labeldistance = labeldistance
+        self.pctdistance = pctdistance
+        self.fig = Figure(figsize=(5, 4), dpi=100)
+        self.ax = self.fig.add_subplot(111)
+        self.canvas = FigureCanvasTkAgg(self.fig, master=master)
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.labels = None
+        self.sizes = None
+        self.wedges = []
+        self.texts = []
+        self.autotexts = []
+        self.legend_texts = []
+
+    def update(self, labels: list[str], sizes: list):
+        """Show sizes (percentages or any non-negative values) for labels."""
+        labels = tuple(labels)
+        sizes = tuple(float(size) for size in sizes)
+        if labels == self.labels and sizes == self.sizes:
+            return
+        total = sum(sizes)
+        # only move the artists of a previous render which drew every wedge, after an empty one there is nothing to move
+        if labels == self.labels and total > 0 and self.wedges and len(self.wedges) == len(sizes):
+            self._move(sizes, total)
+        else:
+            self._rebuild(labels, sizes, total)
+        self.labels = labels
+        self.sizes = sizes
+        self.canvas.draw_idle()
+
+    def relayout(self):
+        """Fit the layout to the current widget size, after a resize."""
+        self.fig.tight_layout()
+        self.canvas.draw_idle()
+
+    def _rebuild(self, labels: tuple, sizes: tuple, total: float):
+        self.ax.clear()
+        self.wedges, self.texts, self.autotexts, self.legend_texts = [], [], [], []
+        if total > 0:
+            self.wedges, self.texts, self.autotexts = self.ax.pie(
+                sizes, labels=labels, autopct='%1.1f%%', startangle=self.startangle,
+                labeldistance=self.labeldistance, pctdistance=self.pctdistance,
+            )
+            for text in [*self.texts, *self.autotexts]:
+                text.set_fontproperties(FONT)
+            # Add legend to the right of the pie chart with Unicode support
+            legend = self.ax.legend(self.wedges, self._legend_labels(labels, sizes), loc="center left", bbox_to_anchor=(1, 0.5), prop=FONT)
+            self.legend_texts = legend.get_texts()
+        self.ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle
+        self.ax.set_title(self.title, fontproperties=FONT)
+        # Adjust layout to make room for the legend
+        self.fig.tight_layout()
+
+    def _move(self, sizes: tuple, total: float):
+        """Place the existing artists for new sizes, the way Axes.pie lays them out."""
+        theta1 = self.startangle
+        for wedge, text, autotext, legend_text, label, size in zip(self.wedges, self.texts, self.autotexts, self.legend_texts, self.labels, sizes):
+            theta2 = theta1 + 360 * size / total
+            wedge.set_theta1(theta1)
+            wedge.set_theta2(theta2)
+            middle = math.radians((theta1 + theta2) / 2)
+            x, y = math.cos(middle), math.sin(middle)
+            text.set_position((self.labeldistance * x, self.labeldistance * y))
+            text.set_horizontalalignment('left' if x > 0 else 'right')
+            autotext.set_position((self.pctdistance * x, self.pctdistance * y))
+            autotext.set_text(f"{100 * size / total:1.1f}%")
+            legend_text.set_text(self._legend_labels([label], [size])[0])
+            theta1 = theta2
+
+    @staticmethod
+    def _legend_labels(labels, sizes) -> list[str]:
+        return [f"{label} - {size:.2f}%" for label, size in zip(labels, sizes)]
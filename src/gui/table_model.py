@@ -0,0 +1,92 @@
+import tkinter as tk
+from tkinter import ttk
+
+# Column kinds, formatted like the command line output (see cli.print_rows)
+FORMATS = {
+    'text': str,
+    'amount': lambda value: f"{value:,.2f}",
+    'percent': lambda value: f"{value:.2f}%",
+}
+
+class TableModel:
+    """
+    Typed rows of a ttk.Treeview, keyed by asset or symbol, which is also the item id in the tree.
+
+    Rows hold the values themselves (Decimal, str, ...) and are sorted by them with sort_key, the display
+    strings are only made for the tree. apply() compares the rows with what the tree shows and only inserts,
+    updates, moves and deletes the items that changed, so a refresh does not rebuild the whole table.
+    Footer rows (like a total) are shown after the rows in the order they were set.
+    """
+
+    def __init__(self, tree: ttk.Treeview, columns: list[tuple[str, str]], sort_key=None):
+        """
+        columns are (field, kind) in the column order of the tree, kind is one of FORMATS or a function
+        formatting the value. sort_key(key, row) orders the rows, they keep their insertion order without one.
+        """
+        self.tree = tree
+        self.columns = [(field, FORMATS[kind] if isinstance(kind, str) else kind) for field, kind in columns]
+        self.sort_key = sort_key
+        self.rows: dict[str, dict] = {}
+        self.footers: dict[str, dict] = {}
+        # the values shown for each item id, so the tree is not read back
+        self.shown: dict[str, tuple] = {}
+        self.order: list[str] = []
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.rows
+
+    def __getitem__(self, key: str) -> dict:
+        return self.rows[key]
+
+    def keys(self) -> list[str]:
+        """Keys of the rows in display order."""
+        if self.sort_key is None:
+            return list(self.rows)
+        return sorted(self.rows, key=lambda key: self.sort_key(key, self.rows[key]))
+
+    def items(self) -> list[tuple[str, dict]]:
+        return [(key, self.rows[key]) for key in self.keys()]
+
+    def set_rows(self, rows: dict[str, dict], footers: dict[str, dict] | None = None):
+        """Replace all rows (and footers), call apply() to show them."""
+        self.rows = dict(rows)
+        self.footers = dict(footers or {})
+
+    def set(self, key: str, row: dict):
+        self.rows[key] = row
+
+    def update(self, key: str, **fields):
+        self.rows[key].update(fields)
+
+    def remove(self, key: str):
+        self.rows.pop(key, None)
+
+    def display(self, row: dict) -> tuple:
+        # missing fields are shown empty, e.g. in a footer
+        return tuple(formatter(row[field]) if row.get(field, '') != '' else '' for field, formatter in self.columns)
+
+    def apply(self):
+        """Bring the tree in line with the rows, touching only the items which changed."""
+        order = [*self.keys(), *self.footers]
+        rows = {**self.rows, **self.footers}
+
+        for key in [key for key in self.shown if key not in rows]:
+            self.tree.delete(key)
+            del self.shown[key]
+        self.order = [key for key in self.order if key in rows]
+
+        for key in order:
+            values = self.display(rows[key])
+            if key not in self.shown:
+                self.tree.insert("", tk.END, iid=key, values=values)
+                self.order.append(key)
+            elif values != self.shown[key]:
+                self.tree.item(key, values=values)
+            self.shown[key] = values
+
+        # move the items which are out of place, those already in order stay
+        for index, key in enumerate(order):
+            if self.order[index] != key:
+                self.tree.move(key, "", index)
+                self.order.remove(key)
+                self.order.insert(index, key)
@@ -1,18 +1,77 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 from portfolio.portfolio import Portfolio
 
+class HoldingRow:
+    def __init__(self, parent, row: int, apply_change):
+        """The widgets of one visible grid row, they are bound to another holding when the grid scrolls."""
+        self.symbol = None
+
+        # Symbol
+        self.symbol_label = ttk.Label(parent)
+        self.symbol_label.grid(row=row, column=0, padx=5, pady=3, sticky="w")
+
+        # Current Share - using a normal Label instead of ttk.Label for color and font support
+        self.share_label = tk.Label(parent, anchor="e")
+        self.share_label.grid(row=row, column=1, padx=5, pady=3, sticky="e")
+        self.default_fg = self.share_label.cget("fg")
+        self.default_font = self.share_label.cget("font")
+
+        # New Share Entry
+        self.share_entry = ttk.Entry(parent, width=15)
+        self.share_entry.grid(row=row, column=2, padx=5, pady=3)
+
+        # Add/Subtract Entry
+        self.delta_entry = ttk.Entry(parent, width=15)
+        self.delta_entry.grid(row=row, column=3, padx=5, pady=3)
+
+        # Apply Button
+        self.apply_button = ttk.Button(parent, text="Apply", command=lambda: apply_change(self.symbol))
+        self.apply_button.grid(row=row, column=4, padx=5, pady=3)
+
+        # Add Enter key binding for the Apply button
+        self.apply_button.bind("<Return>", lambda event: apply_change(self.symbol))
+
+        self.widgets = [self.symbol_label, self.share_label, self.share_entry, self.delta_entry, self.apply_button]
+
+    def show(self, symbol: str, share, modified: bool, entry_texts: tuple[str, str], modified_color: str):
+        self.symbol = symbol
+        self.symbol_label.configure(text=symbol)
+        if modified:
+            # Apply color and bold if this symbol has pending changes
+            self.share_label.configure(text=f"{Decimal(share)}", fg=modified_color, font=('Arial', 10, 'bold'))
+        else:
+            self.share_label.configure(text=f"{Decimal(share)}", fg=self.default_fg, font=self.default_font)
+        for entry, text in zip((self.share_entry, self.delta_entry), entry_texts):
+            if entry.get() != text:
+                entry.delete(0, tk.END)
+                entry.insert(0, text)
+        for widget in self.widgets:
+            widget.grid()
+
+    def hide(self):
+        self.symbol = None
+        for widget in self.widgets:
+            widget.grid_remove()
+
 class AccountingTab:
     def __init__(self, parent, portfolio: Portfolio):
         """Initialize the Accounting tab."""
         self.parent = parent
         self.portfolio = portfolio
         self.pending_changes = {}  # Track pending share changes {symbol: new_share}
+        self.entry_texts = {}  # Text typed into the entries of holdings, also when scrolled out of view {symbol: (new_share, delta)}
 
         # Define colors for modified entries
         self.modified_color = "#CC0000"  # Red color for modified values
 
+        # The grid only has widgets for the visible rows, showing the holdings from index top on
+        self.rows: list[HoldingRow] = []
+        self.top = 0
+        self.row_height = None
+        self.header_height = None
+
         self.setup_ui()
 
     def setup_ui(self):
@@ -21,31 +80,26 @@ class AccountingTab:
         table_frame = ttk.LabelFrame(self.parent, text="Holdings")
         table_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
-        # Create a scrollable frame for holdings
-        self.canvas = tk.Canvas(table_frame)
-        scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.canvas.yview)
-        self.scrollable_frame = ttk.Frame(self.canvas)
-
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-        )
+        # The scrollbar moves the holdings through the rows of the grid instead of scrolling the widgets
+        self.scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.on_scroll)
+        self.scrollbar.pack(side="right", fill="y")
 
-        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=scrollbar.set)
+        # The grid takes the space it is given, not the size of its rows
+        self.grid_frame = ttk.Frame(table_frame)
+        self.grid_frame.grid_propagate(False)
+        self.grid_frame.pack(side="left", fill="both", expand=True)
+        self.grid_frame.bind("<Configure>", lambda e: self.render())
 
         # Add mouse wheel scrolling support
-        self.canvas.bind_all("<MouseWheel>", self._on_mousewheel)
-
-        self.canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+        self.grid_frame.bind("<MouseWheel>", self._on_mousewheel)
 
         # Create table headers
         headers = ["Symbol", "Current Share", "New Share", "Add/Subtract", "Apply"]
+        self.header_labels = []
         for col, header in enumerate(headers):
-            ttk.Label(self.scrollable_frame, text=header, font=('Arial', 10, 'bold')).grid(
-                row=0, column=col, padx=5, pady=5, sticky="w"
-            )
+            label = ttk.Label(self.grid_frame, text=header, font=('Arial', 10, 'bold'))
+            label.grid(row=0, column=col, padx=5, pady=5, sticky="w")
+            self.header_labels.append(label)
 
         # Button frame for actions
         button_frame = ttk.Frame(self.parent)
@@ -63,61 +117,80 @@ class AccountingTab:
         self.refresh_view()
 
     def refresh_view(self):
-        """Refresh the view with current portfolio data."""
-        # Clear existing entries
-        for widget in self.scrollable_frame.winfo_children():
-            if int(widget.grid_info()["row"]) > 0:  # Skip headers
-                widget.destroy()
-
-        # Dictionary to store entry widgets
-        self.share_entries = {}
-        self.delta_entries = {}
-        self.share_labels = {}  # Track the labels showing current share values
-
-        # Add holdings data
-        for i, holding in enumerate(self.portfolio.holdings, start=1):
+        """Refresh the view with current portfolio data, text typed into the entries is cleared."""
+        self.entry_texts = {}
+        self.render(store_entries=False)
+
+    def add_row(self) -> HoldingRow:
+        row = HoldingRow(self.grid_frame, len(self.rows) + 1, self.apply_change)
+        for widget in row.widgets:
+            widget.bind("<MouseWheel>", self._on_mousewheel)
+        self.rows.append(row)
+        if self.row_height is None:
+            self.grid_frame.update_idletasks()
+            # pady of 3 above and below each row
+            self.row_height = max(widget.winfo_reqheight() for widget in row.widgets) + 6
+            self.header_height = max(label.winfo_reqheight() for label in self.header_labels) + 10
+        return row
+
+    def visible_row_count(self) -> int:
+        """Number of rows which fit into the grid, the row height is measured on the first row."""
+        holdings = len(self.portfolio.holdings)
+        if self.row_height is None:
+            if not holdings:
+                return 0
+            self.add_row()
+        return max(1, min(holdings, (self.grid_frame.winfo_height() - self.header_height) // self.row_height))
+
+    def store_entries(self):
+        """Keep the text typed into the visible rows, before they are bound to other holdings."""
+        for row in self.rows:
+            if row.symbol is None:
+                continue
+            texts = (row.share_entry.get(), row.delta_entry.get())
+            if any(texts):
+                self.entry_texts[row.symbol] = texts
+            else:
+                self.entry_texts.pop(row.symbol, None)
+
+    def render(self, store_entries: bool = True):
+        """Show the holdings from top on in the rows of the grid, creating rows only when the grid grows."""
+        if store_entries:
+            self.store_entries()
+        holdings = self.portfolio.holdings
+        count = self.visible_row_count() if holdings else 0
+        self.top = max(0, min(self.top, len(holdings) - count))
+        while len(self.rows) < count:
+            self.add_row()
+
+        for i, row in enumerate(self.rows):
+            if i >= count:
+                row.hide()
+                continue
+            holding = holdings[self.top + i]
             symbol = holding.symbol
-            current_share = self.pending_changes.get(symbol, holding.share)
-            
-            # Symbol
-            ttk.Label(self.scrollable_frame, text=symbol).grid(
-                row=i, column=0, padx=5, pady=3, sticky="w"
+            row.show(
+                symbol,
+                self.pending_changes.get(symbol, holding.share),
+                symbol in self.pending_changes,
+                self.entry_texts.get(symbol, ('', '')),
+                self.modified_color,
             )
 
-            # Current Share - using a normal Label instead of ttk.Label for color and font support
-            share_label = tk.Label(
-                self.scrollable_frame, 
-                text=f"{Decimal(current_share)}",
-                anchor="e"
-            )
-
-            # Apply color and bold if this symbol has pending changes
-            if symbol in self.pending_changes:
-                share_label.config(fg=self.modified_color, font=('Arial', 10, 'bold'))
-
-            share_label.grid(row=i, column=1, padx=5, pady=3, sticky="e")
-            self.share_labels[symbol] = share_label
-
-            # New Share Entry
-            share_entry = ttk.Entry(self.scrollable_frame, width=15)
-            share_entry.grid(row=i, column=2, padx=5, pady=3)
-            self.share_entries[symbol] = share_entry
-
-            # Add/Subtract Entry
-            delta_entry = ttk.Entry(self.scrollable_frame, width=15)
-            delta_entry.grid(row=i, column=3, padx=5, pady=3)
-            self.delta_entries[symbol] = delta_entry
-
-            # Apply Button
-            apply_button = ttk.Button(
-                self.scrollable_frame, 
-                text="Apply", 
-                command=lambda sym=symbol: self.apply_change(sym)
-            )
-            apply_button.grid(row=i, column=4, padx=5, pady=3)
-
-            # Add Enter key binding for the Apply button
-            apply_button.bind("<Return>", lambda event, sym=symbol: self.apply_change(sym))
+        if holdings:
+            self.scrollbar.set(self.top / len(holdings), (self.top + count) / len(holdings))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def on_scroll(self, *args):
+        """Scrollbar command: ('moveto', fraction) or ('scroll', number, 'units' / 'pages')."""
+        holdings = len(self.portfolio.holdings)
+        if args[0] == 'moveto':
+            self.top = round(float(args[1]) * holdings)
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            self.top += step * self.visible_row_count() if args[2] == 'pages' else step
+        self.render()
 
     def apply_change(self, symbol):
         """Apply the change for a specific holding but only store it temporarily."""
@@ -125,11 +198,8 @@ class AccountingTab:
         if not holding:
             return
 
-        share_entry = self.share_entries[symbol]
-        delta_entry = self.delta_entries[symbol]
-
-        new_share = share_entry.get().strip()
-        delta_share = delta_entry.get().strip()
+        self.store_entries()
+        new_share, delta_share = (text.strip() for text in self.entry_texts.get(symbol, ('', '')))
 
         try:
             current_share = self.pending_changes.get(symbol, holding.share)
@@ -141,7 +211,8 @@ class AccountingTab:
                     messagebox.showerror("Error", "Share cannot be negative")
                     return
                 self.pending_changes[symbol] = new_share_val
-                share_entry.delete(0, tk.END)
+                # the delta typed for the holding is kept, like its entry
+                self.entry_texts[symbol] = ('', delta_share)
             elif delta_share:
                 # Apply delta
                 delta_share_val = Decimal(delta_share.replace(',', ''))
@@ -150,18 +221,14 @@ class AccountingTab:
                     messagebox.showerror("Error", "Resulting share would be negative")
                     return
                 self.pending_changes[symbol] = new_total
-                delta_entry.delete(0, tk.END)
+                self.entry_texts.pop(symbol)
             else:
                 return  # No changes to apply
 
             # Update the displayed current share with modified color and bold font
-            self.share_labels[symbol].configure(
-                text=f"{Decimal(self.pending_changes[symbol])}",
-                fg=self.modified_color,
-                font=('Arial', 10, 'bold')
-            )
+            self.render(store_entries=False)
 
-        except ValueError:
+        except (ValueError, InvalidOperation):
             messagebox.showerror("Error", "Invalid number format")
 
     def save_changes(self):
@@ -192,5 +259,6 @@ class AccountingTab:
         messagebox.showinfo("Info", "All pending changes have been reset")
 
     def _on_mousewheel(self, event):
-        """Handle mouse wheel scrolling."""
-        self.canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
+        """Handle mouse wheel scrolling, by rows."""
+        self.top -= int(event.delta / 120) * 3
+        self.render()
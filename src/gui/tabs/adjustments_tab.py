@@ -4,14 +4,17 @@ import re
 import tkinter as tk
 from tkinter import ttk, messagebox
 from portfolio.portfolio import Portfolio
-from rebalancer.calculator import CreateCalculator
+from rebalancer.calculator import CreateCalculator, adjustment_action, available_methods
+from gui.table_model import TableModel
+from gui.task_runner import Task, TaskRunner
 from itertools import chain
 
 class AdjustmentsTab:
-    def __init__(self, parent, portfolio: Portfolio, get_rebalance_duration, get_selected_target_percentage):
+    def __init__(self, parent, portfolio: Portfolio, task_runner: TaskRunner, get_rebalance_duration, get_selected_target_percentage):
         """Initialize the adjustments tab."""
         self.parent = parent
         self.portfolio = portfolio
+        self.task_runner = task_runner
         self.get_rebalance_duration = get_rebalance_duration
         self.get_selected_target_percentage = get_selected_target_percentage
         self.create_tab()
@@ -49,16 +52,41 @@ class AdjustmentsTab:
         refresh_btn = ttk.Button(btn_frame, text="Refresh", command=self.refresh_view)
         refresh_btn.pack(side=tk.RIGHT, padx=5)
 
+        # Calculator selection, the list is read again when it is opened to show new calculator.*.py files
+        ttk.Label(btn_frame, text="Method:").pack(side=tk.LEFT, padx=5)
+        methods = available_methods()
+        self.method_var = tk.StringVar(value='standard' if 'standard' in methods or not methods else methods[0])
+        self.method_combo = ttk.Combobox(
+            btn_frame,
+            textvariable=self.method_var,
+            values=methods,
+            postcommand=lambda: self.method_combo.configure(values=available_methods()),
+            width=15,
+            state="readonly",
+        )
+        self.method_combo.pack(side=tk.LEFT, padx=5)
+        self.method_combo.bind("<<ComboboxSelected>>", lambda event: self.refresh_view())
+
         # Pack the treeview and scrollbar
         self.adjustments_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
-    def refresh_view(self):
-        """Refresh the adjustments view with current data."""
-        # Clear existing data
-        for i in self.adjustments_tree.get_children():
-            self.adjustments_tree.delete(i)
+        # Rows by asset, in the order of the calculator
+        self.adjustments_model = TableModel(self.adjustments_tree, [
+            ('asset', 'text'),
+            ('current', 'percent'),
+            ('target', 'percent'),
+            ('end', 'percent'),
+            ('adjustment', 'amount'),
+            ('adjustment_pct', 'percent'),
+            ('action', lambda action: f"{action[0]} {action[1]:,.2f} per {action[2]}"),
+        ])
 
+        # Populate with data
+        self.refresh_view()
+
+    def refresh_view(self):
+        """Refresh the adjustments view with current data, the adjustments are calculated on the task runner."""
         rebalance_duration = self.get_rebalance_duration()
         valid_rebalance_duration = True
         if not isinstance(rebalance_duration, dict):
@@ -69,17 +97,30 @@ class AdjustmentsTab:
             valid_rebalance_duration = False
 
         if not valid_rebalance_duration:
-            self.adjustments_tree.insert("", tk.END, values=("Invalid Rebalance Duration", "", "", "", "", "", ""))
+            self.render(None)
             return
 
-        # Get adjustments data
         selected_target_percentage = self.get_selected_target_percentage()
-        adjustments = CreateCalculator(self.portfolio, 'standard', selected_target_percentage).calculate_adjustments(rebalance_duration)
+        method = self.method_var.get()
+        self.task_runner.submit(
+            "Calculating adjustments",
+            lambda task: self.load_data(rebalance_duration, selected_target_percentage, method, task),
+            self.render,
+            key='adjustments',
+        )
+
+    def load_data(self, rebalance_duration: dict, selected_target_percentage: str, method: str, task: Task) -> dict[str, dict]:
+        """Rows of the adjustments by asset, on the worker thread since expired market data is fetched first."""
+        self.portfolio.prefetch(task.cancel, task.progress)
+        task.check_cancelled()
+
+        # Get adjustments data
+        adjustments = CreateCalculator(self.portfolio, method, selected_target_percentage).calculate_adjustments(rebalance_duration)
 
         current_pcts = self.portfolio.current_allocation(merge=True)
         target_pcts = self.portfolio.target_percentages(selected=selected_target_percentage)
 
-        # Insert data into treeview
+        rows = {}
         for asset, [amount, end_pct] in adjustments.items():
             current_pct = current_pcts[asset] / self.portfolio.total_value * 100 if asset in current_pcts else 0
             target_pct = target_pcts.get(asset, 0)
@@ -89,131 +130,145 @@ class AdjustmentsTab:
             else:
                 amount_per_granularity = amount / rebalance_duration['value'] / (Decimal(365) / 7 / 12)
 
-            if asset == 'cash':
-                action  = "save" if amount > 0 else "spend" if amount < 0 else "No Change"
-            else:
-                action = "Buy" if amount > 0 else "Sell" if amount < 0 else "No Change"
-
-            self.adjustments_tree.insert("", tk.END, values=(
-                asset,
-                f"{current_pct:.2f}%",
-                f"{target_pct:.2f}%",
-                f"{end_pct * 100:.2f}%",
-                f"{amount:,.2f}",
-                f"{end_pct * 100 - current_pct:.2f}%",
-                f"{action} {abs(amount_per_granularity):,.2f} per {rebalance_granularity}"
-            ))
+            rows[asset] = {
+                'asset': asset,
+                'current': current_pct,
+                'target': target_pct,
+                'end': end_pct * 100,
+                'adjustment': amount,
+                'adjustment_pct': end_pct * 100 - current_pct,
+                'action': (adjustment_action(asset, amount), abs(amount_per_granularity), rebalance_granularity),
+            }
+        return rows
+
+    def render(self, rows: dict[str, dict] | None):
+        """Update the rows which changed in the treeview, None for an invalid rebalance duration."""
+        if rows is None:
+            self.adjustments_model.set_rows({}, footers={'__invalid__': {'asset': "Invalid Rebalance Duration"}})
+        else:
+            self.adjustments_model.set_rows(rows)
+        self.adjustments_model.apply()
 
     def export_report(self):
-        """Export the rebalancing report to a file."""
-        try:
-            rebalance_duration = self.get_rebalance_duration()
-            valid_rebalance_duration = True
-            if not isinstance(rebalance_duration, dict):
-                valid_rebalance_duration = False
-            elif 'unit' not in rebalance_duration or rebalance_duration['unit'] not in ['day', 'month']:
-                valid_rebalance_duration = False
-            elif 'value' not in rebalance_duration or (not isinstance(rebalance_duration['value'], int) and not isinstance(rebalance_duration['value'], Decimal)):
-                valid_rebalance_duration = False
-                
-            if not valid_rebalance_duration:
-                messagebox.showerror("Export Error", "Invalid rebalance duration")
-                return
+        """Export the rebalancing report to a file, the report is made on the task runner."""
+        rebalance_duration = self.get_rebalance_duration()
+        valid_rebalance_duration = True
+        if not isinstance(rebalance_duration, dict):
+            valid_rebalance_duration = False
+        elif 'unit' not in rebalance_duration or rebalance_duration['unit'] not in ['day', 'month']:
+            valid_rebalance_duration = False
+        elif 'value' not in rebalance_duration or (not isinstance(rebalance_duration['value'], int) and not isinstance(rebalance_duration['value'], Decimal)):
+            valid_rebalance_duration = False
+
+        if not valid_rebalance_duration:
+            messagebox.showerror("Export Error", "Invalid rebalance duration")
+            return
+
+        selected_target_percentage = self.get_selected_target_percentage()
+        method = self.method_var.get()
+        self.task_runner.submit(
+            "Exporting report",
+            lambda task: self.create_report(rebalance_duration, selected_target_percentage, method, task),
+            self.save_report,
+            lambda e: messagebox.showerror("Export Error", f"Failed to export report: {str(e)}"),
+        )
+
+    def create_report(self, rebalance_duration: dict, selected_target_percentage: str, method: str, task: Task) -> str:
+        """The text of the rebalancing report, on the worker thread like load_data."""
+        self.portfolio.prefetch(task.cancel, task.progress)
+        task.check_cancelled()
+
+        # Get adjustments using CreateCalculator like in load_data
+        adjustments = CreateCalculator(self.portfolio, method, selected_target_percentage).calculate_adjustments(rebalance_duration)
+        current_allocation = self.portfolio.current_allocation(merge=True)
+        target_percentages = self.portfolio.target_percentages(selected=selected_target_percentage)
+        total_value = self.portfolio.total_value
+
+        # Create a simple report
+        report = "Portfolio Rebalancing Report\n"
+        report += "============================\n"
+
+        report += f"Total Assets: {self.portfolio.total_value:>12.2f}\n"
+
+        # Get all unique assets from both current and target allocations
+        all_assets = set(list(current_allocation.keys()) + list(target_percentages.keys()))
+
+        for asset in chain(['alphabetical order'], sorted(all_assets), ['adjustment order'], adjustments.keys()):
+            if asset.endswith('order'):
+                order = asset
+                # Create formatted allocation comparison table
+                report += f"\nCurrent vs Target Allocation ({order}):\n"
+                report += f"--------------------------------{'-' * len(order)}\n"
+                report += f"{'Asset':<15} {'Current Value':<15} {'Current %':<10} {'Target %':<10} {'End %':<10} {'Adjustment %':<12}\n"
+                continue
+
+            current_value = current_allocation.get(asset, 0)
+            current_pct = current_value / total_value * 100 if total_value > 0 else 0
+            target_pct = target_percentages.get(asset, 0)
+
+            _, end_pct_decimal = adjustments[asset]
+            end_pct = end_pct_decimal * 100
+
+            adjustment_pct = end_pct - current_pct
+
+            def is_cjk(text):
+                cjk_pattern = re.compile(r'[\u4E00-\u9FFF\u3400-\u4DBF\u3040-\u30FF\uAC00-\uD7AF]')
+                return bool(cjk_pattern.search(text))
+
+            cjk_cnt = sum(is_cjk(char) for char in asset)
+            asset_padded = asset + ' ' * max(0, 15 - len(asset) - cjk_cnt)
+
+            report += f"{asset_padded} {current_value:,.2f}".ljust(31 - cjk_cnt)
+            report += f"{current_pct:.2f}%".ljust(11)
+            report += f"{target_pct:.2f}%".ljust(11)
+            report += f"{end_pct:.2f}%".ljust(11)
+            report += f"{adjustment_pct:+.2f}%\n"
+
+        report += "\nAdjustments Needed:\n"
+        report += "------------------\n"
+        for asset, [amount, _] in adjustments.items():
+            action = adjustment_action(asset, amount)
+            amount_abs = abs(amount)
+            report += f"  {asset}: {action} {amount_abs:,.2f}\n"
+            
+        # Add rebalance duration information
+        rebalance_granularity = 'day' if rebalance_duration['unit'] == 'day' else 'week'
+        report += f"\nRebalancing Plan ({rebalance_duration['value']} {rebalance_duration['unit']}s):\n"
+        report += f"---------------------------------------------\n"
+        for asset, [amount, _] in adjustments.items():
+            if amount == 0:
+                continue
                 
-            # Get adjustments using CreateCalculator like in refresh_view
-            selected_target_percentage = self.get_selected_target_percentage()
-            adjustments = CreateCalculator(self.portfolio, 'standard', selected_target_percentage).calculate_adjustments(rebalance_duration)
-            current_allocation = self.portfolio.current_allocation(merge=True)
-            target_percentages = self.portfolio.target_percentages(selected=selected_target_percentage)
-            total_value = self.portfolio.total_value
-
-            # Create a simple report
-            report = "Portfolio Rebalancing Report\n"
-            report += "============================\n"
-
-            report += f"Total Assets: {self.portfolio.total_value:>12.2f}\n"
-
-            # Get all unique assets from both current and target allocations
-            all_assets = set(list(current_allocation.keys()) + list(target_percentages.keys()))
-
-            for asset in chain(['alphabetical order'], sorted(all_assets), ['adjustment order'], adjustments.keys()):
-                if asset.endswith('order'):
-                    order = asset
-                    # Create formatted allocation comparison table
-                    report += f"\nCurrent vs Target Allocation ({order}):\n"
-                    report += f"--------------------------------{'-' * len(order)}\n"
-                    report += f"{'Asset':<15} {'Current Value':<15} {'Current %':<10} {'Target %':<10} {'End %':<10} {'Adjustment %':<12}\n"
-                    continue
-
-                current_value = current_allocation.get(asset, 0)
-                current_pct = current_value / total_value * 100 if total_value > 0 else 0
-                target_pct = target_percentages.get(asset, 0)
-
-                _, end_pct_decimal = adjustments[asset]
-                end_pct = end_pct_decimal * 100
-
-                adjustment_pct = end_pct - current_pct
-
-                def is_cjk(text):
-                    cjk_pattern = re.compile(r'[\u4E00-\u9FFF\u3400-\u4DBF\u3040-\u30FF\uAC00-\uD7AF]')
-                    return bool(cjk_pattern.search(text))
-
-                cjk_cnt = sum(is_cjk(char) for char in asset)
-                asset_padded = asset + ' ' * max(0, 15 - len(asset) - cjk_cnt)
-
-                report += f"{asset_padded} {current_value:,.2f}".ljust(31 - cjk_cnt)
-                report += f"{current_pct:.2f}%".ljust(11)
-                report += f"{target_pct:.2f}%".ljust(11)
-                report += f"{end_pct:.2f}%".ljust(11)
-                report += f"{adjustment_pct:+.2f}%\n"
-
-            report += "\nAdjustments Needed:\n"
-            report += "------------------\n"
-            for asset, [amount, _] in adjustments.items():
-                if asset == 'cash':
-                    action = "Save" if amount > 0 else "Spend" if amount < 0 else "No Change"
-                else:
-                    action = "Buy" if amount > 0 else "Sell" if amount < 0 else "No Change"
-                amount_abs = abs(amount)
-                report += f"  {asset}: {action} {amount_abs:,.2f}\n"
+            if rebalance_duration['unit'] == 'day':
+                amount_per_granularity = amount / rebalance_duration['value']
+            else:
+                amount_per_granularity = amount / rebalance_duration['value'] / (Decimal(365) / 7 / 12)
                 
-            # Add rebalance duration information
-            rebalance_granularity = 'day' if rebalance_duration['unit'] == 'day' else 'week'
-            report += f"\nRebalancing Plan ({rebalance_duration['value']} {rebalance_duration['unit']}s):\n"
-            report += f"---------------------------------------------\n"
-            for asset, [amount, _] in adjustments.items():
-                if amount == 0:
-                    continue
-                    
-                if rebalance_duration['unit'] == 'day':
-                    amount_per_granularity = amount / rebalance_duration['value']
-                else:
-                    amount_per_granularity = amount / rebalance_duration['value'] / (Decimal(365) / 7 / 12)
-                    
-                if asset == 'cash':
-                    action = "Save" if amount > 0 else "Spend" if amount < 0 else "No Change"
-                else:
-                    action = "Buy" if amount > 0 else "Sell" if amount < 0 else "No Change"
-                    
-                report += f"  {asset}: {action} {abs(amount_per_granularity):,.2f} per {rebalance_granularity}\n"
-
-            # Ask user for file location
-            from tkinter import filedialog
-            file_path = filedialog.asksaveasfilename(
-                defaultextension=".txt",
-                filetypes=[("Text files", "*.txt"), ("All files", "*.*")],
-                initialfile=datetime.now().strftime("%Y-%m-%d.txt"),
-                title="Save Rebalancing Report"
-            )
-            
-            if not file_path:  # User canceled the dialog
-                return
+            action = adjustment_action(asset, amount)
                 
+            report += f"  {asset}: {action} {abs(amount_per_granularity):,.2f} per {rebalance_granularity}\n"
+        return report
+
+    def save_report(self, report: str):
+        """Ask for the file of the report and write it, on the Tk thread."""
+        # Ask user for file location
+        from tkinter import filedialog
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".txt",
+            filetypes=[("Text files", "*.txt"), ("All files", "*.*")],
+            initialfile=datetime.now().strftime("%Y-%m-%d.txt"),
+            title="Save Rebalancing Report"
+        )
+
+        if not file_path:  # User canceled the dialog
+            return
+
+        try:
             # Save to file
             with open(file_path, "w", encoding='utf-8') as f:
                 f.write(report)
-
-            messagebox.showinfo("Export Complete", f"Report exported to {file_path}")
-
-        except Exception as e:
+        except OSError as e:
             messagebox.showerror("Export Error", f"Failed to export report: {str(e)}")
+            return
+
+        messagebox.showinfo("Export Complete", f"Report exported to {file_path}")
@@ -1,14 +1,17 @@
+from decimal import Decimal
 import tkinter as tk
 from tkinter import ttk
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
 from portfolio.portfolio import Portfolio
+from gui.pie_chart import PieChart
+from gui.table_model import TableModel
+from gui.task_runner import Task, TaskRunner
 
 class AllocationTab:
-    def __init__(self, parent, portfolio: Portfolio):
+    def __init__(self, parent, portfolio: Portfolio, task_runner: TaskRunner):
         """Initialize the allocation tab."""
         self.parent = parent
         self.portfolio = portfolio
+        self.task_runner = task_runner
         self.refreshing = False
         self.merge_var = tk.BooleanVar(value=False)  # Initialize checkbox variable
         self.create_tab()
@@ -51,61 +54,44 @@ class AllocationTab:
         self.allocation_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
+        # Rows by asset, sorted by percentage ascending
+        self.allocation_model = TableModel(
+            self.allocation_tree,
+            [('asset', 'text'), ('value', 'amount'), ('percentage', 'percent')],
+            sort_key=lambda asset, row: row['percentage'],
+        )
+
         # Create pie chart in right frame
-        self.fig = Figure(figsize=(5, 4), dpi=100)
-        self.ax = self.fig.add_subplot(111)
-        self.canvas = FigureCanvasTkAgg(self.fig, master=right_frame)
-        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.chart = PieChart(right_frame, 'Portfolio Allocation')
 
         # Populate with data
         self.refresh_view()
+
     def refresh_view(self):
-        """Refresh the allocation view with current data."""
-        # Clear existing data
-        for i in self.allocation_tree.get_children():
-            self.allocation_tree.delete(i)
-
-        # Get current allocation
-        allocation = self.portfolio.current_allocation(merge=self.merge_var.get())
-
-        # Insert data into treeview
-        labels = []
-        sizes = []
-        items = []
-        for asset, value in allocation.items():
-            percentage = value / self.portfolio.total_value * 100
-            items.append((asset, f"{value:,.2f}", f"{percentage:.2f}%"))
-
-            labels.append(asset)
-            sizes.append(percentage)
-
-        # sort labels and sizes by sizes asc
-        sorted_indices = sorted(range(len(sizes)), key=lambda i: sizes[i])
-        labels = [labels[i] for i in sorted_indices]
-        sizes = [sizes[i] for i in sorted_indices]
-
-        for i in sorted_indices:
-            self.allocation_tree.insert("", tk.END, values=items[i])
-        self.allocation_tree.insert("", tk.END, values=("Total", f"{self.portfolio.total_value:,.2f}", "100.00%"))
+        """Refresh the allocation view with current data, which is loaded on the task runner."""
+        merge = self.merge_var.get()
+        self.task_runner.submit("Refreshing allocation", lambda task: self.load_data(merge, task), self.render, key='allocation')
+
+    def load_data(self, merge: bool, task: Task) -> tuple[dict, Decimal]:
+        """Current allocation and total value, on the worker thread since expired market data is fetched first."""
+        self.portfolio.prefetch(task.cancel, task.progress)
+        task.check_cancelled()
+        return self.portfolio.current_allocation(merge=merge), self.portfolio.total_value
+
+    def render(self, data: tuple[dict, Decimal]):
+        allocation, total_value = data
+
+        # Update the rows which changed in the treeview
+        self.allocation_model.set_rows(
+            {asset: {'asset': asset, 'value': value, 'percentage': value / total_value * 100} for asset, value in allocation.items()},
+            footers={'__total__': {'asset': 'Total', 'value': total_value, 'percentage': Decimal(100)}},
+        )
+        self.allocation_model.apply()
+
+        # Labels and sizes in the order of the table, by percentage asc
+        rows = self.allocation_model.items()
+        labels = [asset for asset, _ in rows]
+        sizes = [row['percentage'] for _, row in rows]
 
         # Update pie chart
-        self.ax.clear()
-        patches, texts, autotexts = self.ax.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90)
-
-        # Set font properties that support Chinese characters
-        font_prop = {'family': 'Microsoft YaHei', 'size': 9}
-        for text in texts:
-            text.set_fontproperties(font_prop)
-        for autotext in autotexts:
-            autotext.set_fontproperties(font_prop)
-
-        self.ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle
-        self.ax.set_title('Portfolio Allocation', fontproperties=font_prop)
-
-        # Add legend to the right of the pie chart with Unicode support
-        legend_labels = [f"{label} - {pct:.2f}%" for label, pct in zip(labels, sizes)]
-        legend = self.ax.legend(patches, legend_labels, loc="center left", bbox_to_anchor=(1, 0.5), prop=font_prop)
-
-        # Adjust layout to make room for the legend
-        self.fig.tight_layout()
-        self.canvas.draw()
+        self.chart.update(labels, sizes)
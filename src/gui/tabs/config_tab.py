@@ -1,8 +1,8 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
 from portfolio.portfolio import Portfolio
+from gui.pie_chart import PieChart
+from gui.table_model import TableModel
 from decimal import Decimal
 
 class ConfigurationTab:
@@ -62,15 +62,19 @@ class ConfigurationTab:
         self.config_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
+        # Target percentages being edited by asset, sorted by percentage and then asset
+        self.config_model = TableModel(
+            self.config_tree,
+            [('asset', 'text'), ('percentage', 'percent')],
+            sort_key=lambda asset, row: (row['percentage'], asset),
+        )
+
         # Add "+" button below the treeview
         add_button = ttk.Button(left_frame, text="+", width=3, command=self.add_new_asset)
         add_button.pack(side=tk.TOP, anchor=tk.W, padx=5, pady=2)
 
         # Create pie chart in right frame for target allocation preview
-        self.config_fig = Figure(figsize=(5, 4), dpi=100)
-        self.config_ax = self.config_fig.add_subplot(111)
-        self.config_canvas = FigureCanvasTkAgg(self.config_fig, master=right_frame)
-        self.config_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.chart = PieChart(right_frame, 'Target Allocation')
 
         # Bottom frame for buttons
         btn_frame = ttk.Frame(left_frame)
@@ -190,12 +194,9 @@ class ConfigurationTab:
         # Only allow editing the percentage column
         if column == "#2":  # Target % column
             self.editing = True
-            asset = self.config_tree.item(item, "values")[0]
-            current_value = self.config_tree.item(item, "values")[1]
-
-            # Remove % sign for editing
-            if current_value.endswith('%'):
-                current_value = current_value[:-1]
+            # the item id is the asset
+            asset = item
+            current_value = f"{self.config_model[asset]['percentage']:.2f}"
 
             # Create a popup for editing
             popup = tk.Toplevel()
@@ -223,7 +224,7 @@ class ConfigurationTab:
                 try:
                     new_value = Decimal(entry.get())
                     if 0 <= new_value <= 100:
-                        self.config_tree.item(item, values=(asset, f"{new_value:.2f}%"))
+                        self.config_model.update(asset, percentage=new_value)
                         self.refresh_view()
                         popup.destroy()
                         self.editing = False
@@ -253,89 +254,35 @@ class ConfigurationTab:
 
     def populate_data(self):
         """Refresh the configuration view with current data."""
-        # Clear existing data
-        for i in self.config_tree.get_children():
-            self.config_tree.delete(i)
-
         # Get target percentages for the currently selected configuration
         target_pcts = self.portfolio.target_percentages(self.current_target_name)
 
-        # Insert data into treeview
-        for asset, percentage in target_pcts.items():
-            self.config_tree.insert("", tk.END, values=(asset, f"{percentage:.2f}%"))
-
+        self.config_model.set_rows({asset: {'asset': asset, 'percentage': percentage} for asset, percentage in target_pcts.items()})
         self.refresh_view()
 
     def refresh_view(self):
         """Update the pie chart preview based on current settings."""
-        # Get data from treeview
-        items_data = []
-        total = 0
-
-        for item in self.config_tree.get_children():
-            asset, percentage = self.config_tree.item(item, "values")
-            if percentage.endswith('%'):
-                percentage = Decimal(percentage[:-1])
-            else:
-                percentage = Decimal(percentage)
-
-            items_data.append((asset, percentage))
-            self.config_tree.delete(item)
-            total += percentage
-
-        # Sort items alphabetically by asset name
-        items_data.sort(key=lambda x: (x[1], x[0]))
-
-        # Re-insert in sorted order
-        for asset, percentage in items_data:
-            self.config_tree.insert("", tk.END, values=(asset, f"{percentage:.2f}%"))
+        # Show the edited rows in sorted order, only the rows which changed are touched
+        self.config_model.apply()
 
         # Extract sorted labels and sizes
-        labels = [item[0] for item in items_data]
-        sizes = [item[1] for item in items_data]
+        items_data = self.config_model.items()
+        labels = [asset for asset, _ in items_data]
+        sizes = [row['percentage'] for _, row in items_data]
+        total = sum(sizes)
 
         # Update total percentage display
         self.total_percentage_var.set(f"Total: {total:.2f}%")
 
         # Update pie chart
-        self.config_ax.clear()
-        patches, texts, autotexts = self.config_ax.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90)
-
-        # Set font properties that support Chinese characters
-        font_prop = {'family': 'Microsoft YaHei', 'size': 9}
-        for text in texts:
-            text.set_fontproperties(font_prop)
-        for autotext in autotexts:
-            autotext.set_fontproperties(font_prop)
-
-        self.config_ax.axis('equal')
-        self.config_ax.set_title('Target Allocation', fontproperties=font_prop)
-
-        # Add legend to the right of the pie chart with Unicode support
-        legend_labels = [f"{label} - {pct:.2f}%" for label, pct in zip(labels, sizes)]
-        legend = self.config_ax.legend(patches, legend_labels, loc="center left", bbox_to_anchor=(1, 0.5), 
-                                     prop=font_prop)
-
-        # Adjust layout to make room for the legend
-        self.config_fig.tight_layout()
-        self.config_canvas.draw()
+        self.chart.update(labels, sizes)
 
     def save_target_allocations(self):
         """Save the target allocations to the portfolio."""
         try:
-            new_targets = {}
-            total = 0
-
-            # Collect data from treeview
-            for item in self.config_tree.get_children():
-                asset, percentage = self.config_tree.item(item, "values")
-                if percentage.endswith('%'):
-                    percentage = Decimal(percentage[:-1])
-                else:
-                    percentage = Decimal(percentage)
-
-                new_targets[asset] = percentage
-                total += percentage
+            # Collect data from the table model
+            new_targets = {asset: row['percentage'] for asset, row in self.config_model.items()}
+            total = sum(new_targets.values())
 
             # Validate total is close to 100%
             if total != 100: # if not 99.5 <= total <= 100.5:
@@ -397,10 +344,9 @@ class ConfigurationTab:
                 return
 
             # Check if asset already exists
-            for item in self.config_tree.get_children():
-                if self.config_tree.item(item, "values")[0] == asset_name:
-                    messagebox.showerror("Duplicate Asset", f"Asset '{asset_name}' already exists.")
-                    return
+            if asset_name in self.config_model:
+                messagebox.showerror("Duplicate Asset", f"Asset '{asset_name}' already exists.")
+                return
 
             try:
                 percentage = Decimal(pct_entry.get())
@@ -408,8 +354,8 @@ class ConfigurationTab:
                     messagebox.showerror("Invalid Percentage", "Percentage must be between 0 and 100.")
                     return
 
-                # Add to treeview
-                self.config_tree.insert("", tk.END, values=(asset_name, f"{percentage:.2f}%"))
+                # Add to the table
+                self.config_model.set(asset_name, {'asset': asset_name, 'percentage': percentage})
                 self.refresh_view()
                 popup.destroy()
 
@@ -0,0 +1,132 @@
+import queue
+import threading
+from tkinter import messagebox
+
+class TaskCancelled(Exception):
+    """Raised by a task's work to stop once the task is cancelled, its on_done is not called."""
+
+class Task:
+    def __init__(self, name: str, work, on_done=None, on_error=None, key=None):
+        """
+        A unit of work for TaskRunner.
+        work(task) runs on the worker thread and must not touch Tk, on_done(result) and on_error(exception) run on the Tk thread.
+        """
+        self.name = name
+        self.work = work
+        self.on_done = on_done
+        self.on_error = on_error
+        self.key = key
+        self.cancel = threading.Event()
+        self.progress_text = ''
+        self.events = None
+
+    def progress(self, done: int, total: int):
+        """Report progress, from the worker thread."""
+        self.events.put(('progress', self, f"{done}/{total}"))
+
+    def check_cancelled(self):
+        if self.cancel.is_set():
+            raise TaskCancelled(f"{self.name} cancelled.")
+
+class TaskRunner:
+    """
+    Runs fetch and compute work off the Tk thread, one task at a time on a worker thread so that tasks never work
+    on the portfolio concurrently, and hands the results back to the Tk thread by polling a queue with root.after.
+
+    A task submitted with the key of a queued task replaces it, so repeated requests for the same refresh collapse
+    into the running one and at most one queued after it, which sees the latest state.
+    """
+
+    poll_interval = 50
+
+    def __init__(self, root, on_status=None, on_finished=None):
+        """on_status(text) shows the state of the tasks, on_finished() is called after each task."""
+        self.root = root
+        self.on_status = on_status
+        self.on_finished = on_finished
+        self.pending: list[Task] = []
+        self.running: Task | None = None
+        self.polling = False
+        self.jobs = queue.Queue()
+        self.events = queue.Queue()
+        threading.Thread(target=self.work, name='gui-task', daemon=True).start()
+
+    def submit(self, name: str, work, on_done=None, on_error=None, key=None) -> Task:
+        task = Task(name, work, on_done, on_error, key)
+        task.events = self.events
+        if key is not None:
+            self.pending = [pending for pending in self.pending if pending.key != key]
+        self.pending.append(task)
+        self.start_next()
+        return task
+
+    def cancel(self, event=None):
+        """Cancel the running task and drop the queued ones."""
+        self.pending.clear()
+        if self.running is not None:
+            self.running.cancel.set()
+            self.running.progress_text = 'cancelling'
+        self.update_status()
+
+    def is_busy(self) -> bool:
+        return self.running is not None or bool(self.pending)
+
+    def start_next(self):
+        if self.running is None and self.pending:
+            self.running = self.pending.pop(0)
+            self.jobs.put(self.running)
+        self.update_status()
+        if self.running is not None and not self.polling:
+            self.polling = True
+            self.root.after(self.poll_interval, self.poll)
+
+    def work(self):
+        """The worker thread."""
+        while True:
+            task = self.jobs.get()
+            try:
+                self.events.put(('done', task, task.work(task)))
+            except TaskCancelled:
+                self.events.put(('cancelled', task, None))
+            except Exception as e:
+                self.events.put(('error', task, e))
+
+    def poll(self):
+        """Handle the events of the worker thread, on the Tk thread."""
+        self.polling = False
+        while True:
+            try:
+                kind, task, value = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'progress':
+                if not task.cancel.is_set():
+                    task.progress_text = value
+                continue
+            self.running = None
+            if kind == 'error' and task.on_error is None:
+                messagebox.showerror("Error", f"{task.name} failed: {value}")
+            try:
+                if kind == 'done' and task.on_done is not None:
+                    task.on_done(value)
+                elif kind == 'error' and task.on_error is not None:
+                    task.on_error(value)
+                if self.on_finished is not None:
+                    self.on_finished()
+            except Exception as e:
+                # keep polling for the other tasks
+                messagebox.showerror("Error", f"{task.name} failed: {e}")
+        self.start_next()
+
+    def update_status(self):
+        if self.on_status is None:
+            return
+        if self.running is None:
+            self.on_status("Ready")
+            return
+        status = self.running.name
+        if self.running.progress_text:
+            status += f" ({self.running.progress_text})"
+        if self.pending:
+            status += f", {len(self.pending)} more queued"
+        self.on_status(status + "... Press Esc to cancel.")
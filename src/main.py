@@ -1,13 +1,36 @@
 import argparse
-import tkinter as tk
-from portfolio.portfolio import Portfolio
+import sys
 from utils.logger import setup_logger
-from gui.gui_app import PortfolioRebalancerGUI
+from market_data.metrics import metrics
 
 def main():
     # Parse command line arguments
     parser = argparse.ArgumentParser(description="Portfolio Rebalancer")
     parser.add_argument("--portfolio", type=str, help="Path to portfolio JSON file", default="data/portfolio.json")
+    parser.add_argument("--market", type=str, help="Path to market data file, .json or SQLite (.db, .sqlite)", default="data/market_data.json")
+    parser.add_argument("--metrics-out", type=str, help="Write fetch metrics to this file on exit, as JSON if it ends with .json, otherwise in the Prometheus text format")
+    parser.add_argument("--metrics-report", action="store_true", help="Print a report of the slowest fetchers and symbols on exit")
+    subparsers = parser.add_subparsers(dest="command", metavar="command", help="gui (default), allocation, adjust, refresh or daemon")
+
+    subparsers.add_parser("gui", help="Open the GUI")
+
+    allocation_parser = subparsers.add_parser("allocation", help="Print the current allocation")
+    allocation_parser.add_argument("--merge", action="store_true", help="Merge assets as configured in the portfolio")
+
+    adjust_parser = subparsers.add_parser("adjust", help="Print the adjustments to rebalance towards a target")
+    adjust_parser.add_argument("--target", type=str, help="Target percentage configuration, the selected one by default")
+    adjust_parser.add_argument("--duration", type=str, help="Rebalance duration", default="1")
+    adjust_parser.add_argument("--unit", choices=["day", "month"], help="Unit of the rebalance duration", default="day")
+    adjust_parser.add_argument("--method", type=str, help="Calculator method, the * of a rebalancer/calculator.*.py file", default="standard")
+
+    refresh_parser = subparsers.add_parser("refresh", help="Fetch the expired market data of the portfolio and print its state")
+    refresh_parser.add_argument("--all", action="store_true", help="Refresh every symbol of the market data, not only the portfolio's")
+    refresh_parser.add_argument("--resolve", action="store_true", help="Ask for the compositions waiting to be updated")
+
+    for subparser in (allocation_parser, adjust_parser, refresh_parser):
+        subparser.add_argument("--format", choices=["table", "csv", "json"], help="Output format", default="table")
+
+    subparsers.add_parser("daemon", help="Run without the GUI, refreshing the market data at each exchange's publish time")
     args = parser.parse_args()
 
     logger = setup_logger('portfolio_rebalancer')
@@ -16,17 +39,56 @@ def main():
     # config = Config('config.json')
     # logger.info("Configuration loaded successfully.")
 
+    try:
+        match args.command:
+            case "allocation" | "adjust" | "refresh":
+                # the headless commands never import tkinter or matplotlib
+                import cli
+                try:
+                    getattr(cli, f"run_{args.command}")(args, logger)
+                except (ValueError, OSError) as e:
+                    logger.error(str(e))
+                    sys.exit(1)
+            case "daemon":
+                run_daemon(args, logger)
+            case _:
+                run_gui(args, logger)
+    finally:
+        write_metrics(args, logger)
+
+def run_gui(args, logger):
+    import tkinter as tk
+    from portfolio.portfolio import Portfolio
+    from gui.gui_app import PortfolioRebalancerGUI
+
     # Determine portfolio file path - CLI argument takes precedence over config
     portfolio_file = args.portfolio
     logger.info(f"Using portfolio file: {portfolio_file}")
 
-    portfolio = Portfolio(portfolio_file, "data/market_data.json", logger)
-
-    # GUI interface
+    # GUI interface, the window is shown before the portfolio and its market data are loaded
     root = tk.Tk()
 
-    app = PortfolioRebalancerGUI(root, portfolio)
+    app = PortfolioRebalancerGUI(root, lambda: Portfolio(portfolio_file, args.market, logger))
     root.mainloop()
 
+def run_daemon(args, logger):
+    from market_data.market import Market
+    from market_data.daemon import RefreshDaemon
+    market = Market(args.market, logger)
+    daemon = RefreshDaemon(market, logger)
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        daemon.stop.set()
+    finally:
+        market.flush()
+
+def write_metrics(args, logger):
+    if args.metrics_out:
+        metrics.write(args.metrics_out)
+        logger.info(f"Fetch metrics written to {args.metrics_out}")
+    if args.metrics_report:
+        print(metrics.report(), file=sys.stderr)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
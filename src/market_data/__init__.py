@@ -1,27 +1,131 @@
 import os
+import json
 import importlib.util
-import glob
-from typing import Dict
+import threading
+from collections.abc import MutableMapping
 from market_data.fetcher import Fetcher
 
-# Initialize the market_fetcher dictionary
-market_fetcher: Dict[str, Fetcher] = {}
-
-# Get the directory where this __init__.py file is located
-current_dir = os.path.dirname(os.path.abspath(__file__))
-
-# Find all fetcher.*.py files in the current directory
-fetcher_files = glob.glob(os.path.join(current_dir, 'fetcher.*.py'))
-
-# Import each file
-for fetcher_file in fetcher_files:
-	# Get module name without .py extension
-	module_name = os.path.basename(fetcher_file)[:-3]  # Remove ".py"
-	
-	try:
-		# Use importlib.util for more direct file importing
-		spec = importlib.util.spec_from_file_location(module_name, fetcher_file)
-		module = importlib.util.module_from_spec(spec)
-		spec.loader.exec_module(module)
-	except Exception as e:
-		print(f"Error importing {fetcher_file}: {e}")
+class FetcherRegistry(MutableMapping):
+	"""
+	Maps symbols to the fetchers registered by the fetcher.*.py plugins (market_fetcher[symbol] = SomeFetcher(...)).
+
+	Plugins are imported on first access to one of their symbols. Which plugin registers which symbols is kept in a manifest
+	next to the plugins, rebuilt for the plugins whose file changed since, by importing them.
+	"""
+
+	MANIFEST = '.fetcher_manifest.json'
+
+	def __init__(self, directory: str):
+		self.directory = directory
+		self.fetchers: dict[str, Fetcher] = {}
+		self.manifest: dict[str, dict] = {}
+		self.symbol_files: dict[str, str] = {}
+		self.loaded_files = set()
+		self.lock = threading.RLock()
+
+	def scan(self):
+		"""Read the manifest and import the plugins which are new or changed to refresh it."""
+		manifest_path = os.path.join(self.directory, self.MANIFEST)
+		try:
+			with open(manifest_path, 'r', encoding='utf-8') as f:
+				cached = json.load(f)
+		except (OSError, ValueError):
+			cached = {}
+
+		manifest = {}
+		changed = False
+		for file_name in sorted(os.listdir(self.directory)):
+			# fetcher.*.py, not fetcher.py itself
+			if not (file_name.startswith('fetcher.') and file_name.endswith('.py') and file_name.count('.') >= 2):
+				continue
+			stat = os.stat(os.path.join(self.directory, file_name))
+			entry = cached.get(file_name)
+			if entry is not None and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+				manifest[file_name] = entry
+				continue
+			symbols = self._load(file_name)
+			changed = True
+			if symbols is not None:
+				manifest[file_name] = {'mtime': stat.st_mtime, 'size': stat.st_size, 'symbols': symbols}
+		changed = changed or manifest.keys() != cached.keys()
+
+		with self.lock:
+			self.manifest = manifest
+			self.symbol_files = {symbol: file_name for file_name, entry in manifest.items() for symbol in entry['symbols']}
+		if changed:
+			try:
+				with open(manifest_path, 'w', encoding='utf-8') as f:
+					json.dump(manifest, f, ensure_ascii=False, indent='\t')
+			except OSError as e:
+				print(f"Error writing {manifest_path}: {e}")
+
+	def _load(self, file_name: str) -> dict[str, str] | None:
+		"""Import a plugin, returns {symbol: kind} of the fetchers it registered, or None if it failed."""
+		fetcher_file = os.path.join(self.directory, file_name)
+		# Get module name without .py extension
+		module_name = file_name[:-3]
+		with self.lock:
+			self.loaded_files.add(file_name)
+			before = dict(self.fetchers)
+			try:
+				# Use importlib.util for more direct file importing
+				spec = importlib.util.spec_from_file_location(module_name, fetcher_file)
+				module = importlib.util.module_from_spec(spec)
+				spec.loader.exec_module(module)
+			except Exception as e:
+				print(f"Error importing {fetcher_file}: {e}")
+				return None
+			return {symbol: fetcher.kind for symbol, fetcher in self.fetchers.items() if before.get(symbol) is not fetcher}
+
+	def kind_of(self, symbol: str) -> str | None:
+		"""Kind of a symbol's fetcher, without importing its plugin."""
+		file_name = self.symbol_files.get(symbol)
+		if file_name is not None:
+			return self.manifest[file_name]['symbols'][symbol]
+		fetcher = self.fetchers.get(symbol)
+		return fetcher.kind if fetcher is not None else None
+
+	def _resolve(self, symbol: str) -> Fetcher | None:
+		"""The fetcher of a symbol, importing its plugin if needed, or None if there is none."""
+		fetcher = self.fetchers.get(symbol)
+		if fetcher is not None:
+			return fetcher
+		with self.lock:
+			file_name = self.symbol_files.get(symbol)
+			if file_name is None:
+				return None
+			if file_name not in self.loaded_files and self._load(file_name) is None:
+				# the plugin failed to import, none of its symbols has a fetcher now
+				self.symbol_files = {s: f for s, f in self.symbol_files.items() if f != file_name}
+			fetcher = self.fetchers.get(symbol)
+			if fetcher is None:
+				# the manifest is out of date, the plugin no longer registers the symbol
+				self.symbol_files.pop(symbol, None)
+			return fetcher
+
+	def __getitem__(self, symbol: str) -> Fetcher:
+		fetcher = self._resolve(symbol)
+		if fetcher is None:
+			raise KeyError(symbol)
+		return fetcher
+
+	def __setitem__(self, symbol: str, fetcher: Fetcher):
+		self.fetchers[symbol] = fetcher
+
+	def __delitem__(self, symbol: str):
+		del self.fetchers[symbol]
+		self.symbol_files.pop(symbol, None)
+
+	def __contains__(self, symbol) -> bool:
+		# imports the symbol's plugin, so that a plugin which fails is not reported as having the symbol
+		return self._resolve(symbol) is not None
+
+	def __iter__(self):
+		return iter(dict.fromkeys([*self.symbol_files, *self.fetchers]))
+
+	def __len__(self) -> int:
+		return len(self.symbol_files.keys() | self.fetchers.keys())
+
+# Initialize the market_fetcher registry, plugins import it to register their fetchers
+market_fetcher = FetcherRegistry(os.path.dirname(os.path.abspath(__file__)))
+market_fetcher.scan()
@@ -0,0 +1,101 @@
+import threading
+from datetime import datetime, timedelta
+from pytz import timezone
+from market_data import market_fetcher
+from market_data.fetcher import PUBLISH_TIMES, exchange_of
+from market_data.market import Market
+from utils.trading_calendar import get_calendar
+
+class RefreshDaemon:
+    """
+    Keeps the market data warm without the GUI: refreshes everything on start, then wakes refresh_delay after each
+    exchange's publish time (see market_data.fetcher.PUBLISH_TIMES) on its trading days to refetch only the symbols of that
+    exchange, and whenever a symbol that failed before is due again (see RetrySchedule). Every refresh writes through to
+    the market store, which is reloaded before each refresh to pick up what other processes (like the GUI) changed.
+    """
+
+    # Margin after the publish time of an exchange, for sources which publish late
+    refresh_delay = timedelta(minutes=30)
+
+    def __init__(self, market: Market, logger, stop: threading.Event | None = None):
+        self.market = market
+        self.logger = logger
+        self.stop = stop or threading.Event()
+
+    def symbols_by_exchange(self) -> dict[str, list[str]]:
+        """The symbols of the market data with a fetcher, by exchange, without importing the fetcher plugins."""
+        symbols = {}
+        for symbol in self.market.data['holdings']:
+            kind = market_fetcher.kind_of(symbol)
+            if kind is not None:
+                symbols.setdefault(exchange_of(kind), []).append(symbol)
+        return symbols
+
+    def next_refresh(self, exchange: str, now: datetime) -> datetime:
+        """The first refresh time of an exchange after now, on one of its trading days."""
+        zone, at = PUBLISH_TIMES[exchange]
+        tz = timezone(zone) if zone is not None else None
+        local_now = now.astimezone(tz) if tz is not None else now.astimezone()
+        calendar = get_calendar(exchange)
+        day = local_now.date() - timedelta(days=1)
+        while True:
+            try:
+                day = calendar.next(day)
+            except ValueError as e:
+                # past the end of the calendar, assume every weekday trades rather than stop refreshing
+                self.logger.warning(str(e))
+                day += timedelta(days=1)
+                while day.weekday() >= 5:
+                    day += timedelta(days=1)
+            naive = datetime.combine(day, at)
+            refresh_at = (tz.localize(naive) if tz is not None else naive.astimezone()) + self.refresh_delay
+            if refresh_at > now:
+                return refresh_at
+
+    def next_retry(self, now: datetime) -> datetime | None:
+        """The earliest retry of a failed symbol after now, the ones already past were tried with the last refresh."""
+        retry_times = [datetime.fromisoformat(entry['retry_at']) for entry in list(self.market.retry_schedule.entries.values())]
+        return min((retry_at for retry_at in retry_times if retry_at > now), default=None)
+
+    def reload(self):
+        """Pick up the holdings and compositions other processes sharing the market store changed."""
+        try:
+            self.market.reload()
+        except Exception as e:
+            self.logger.error(f"Reloading the market data failed: {e}")
+
+    def refresh(self, symbols: list[str] | None = None):
+        # prefetch moves the latest trading day clock on, see utils.trading_day.refresh_latest_trading_days
+        try:
+            self.market.prefetch(symbols, self.stop)
+        except Exception as e:
+            self.logger.error(f"Refresh failed: {e}")
+
+    def run(self):
+        """Refresh until stop is set."""
+        self.logger.info("Refresh daemon started.")
+        self.refresh()
+        now = datetime.now().astimezone()
+        schedule = {exchange: self.next_refresh(exchange, now) for exchange in PUBLISH_TIMES}
+        while not self.stop.is_set():
+            wake_at = min(schedule.values())
+            next_retry = self.next_retry(datetime.now().astimezone())
+            if next_retry is not None and next_retry < wake_at:
+                wake_at = next_retry
+            self.logger.info(f"Next refresh at {wake_at:%Y-%m-%d %H:%M %Z}.")
+            if self.stop.wait(max(0, (wake_at - datetime.now().astimezone()).total_seconds())):
+                break
+
+            now = datetime.now().astimezone()
+            due = [exchange for exchange, refresh_at in schedule.items() if refresh_at <= now]
+            self.reload()
+            by_exchange = self.symbols_by_exchange()
+            symbols = [symbol for exchange in due for symbol in by_exchange.get(exchange, [])]
+            # symbols which failed before are retried with whichever exchange is refreshed, is_expired skips those not due
+            symbols.extend(self.market.retry_schedule.entries)
+            if due:
+                self.logger.info(f"Refreshing {', '.join(due)}.")
+            self.refresh(list(dict.fromkeys(symbols)))
+            for exchange in due:
+                schedule[exchange] = self.next_refresh(exchange, now)
+        self.logger.info("Refresh daemon stopped.")
@@ -1,26 +1,81 @@
 from abc import ABC, abstractmethod
-from datetime import date, datetime, timedelta
+import asyncio
+from datetime import date, time
 from decimal import Decimal
-from utils.trading_day import latest_china_trading_day, latest_us_trading_day
+from market_data.http_client import http_client
+from utils import trading_day
+
+def exchange_of(kind: str) -> str:
+    """The exchange whose trading days date the values of a fetcher kind, see utils.trading_calendar."""
+    match kind:
+        case 'US_STOCK' | 'US_FUND':
+            return 'NYSE'
+        case 'BTC':
+            return 'CRYPTO'
+        case _:
+            return 'SSE'
+
+# When the value of a trading day is usually published, on that day in the market's time zone:
+# (time zone, local time) per exchange, None for the local time zone
+PUBLISH_TIMES = {
+    'SSE': ('Asia/Shanghai', time(20, 0)),
+    'NYSE': ('US/Eastern', time(18, 0)),
+    # the crypto clock moves on at 15:00 local time, see utils.trading_day.get_latest_crypto_day
+    'CRYPTO': (None, time(15, 0)),
+}
+# Fetcher kinds published before the rest of their exchange
+KIND_PUBLISH_TIMES = {
+    'US_STOCK': ('US/Eastern', time(16, 30)),
+}
+
+def publish_time_of(kind: str) -> tuple[str | None, time]:
+    """The usual publish time of the values of a fetcher kind, see PUBLISH_TIMES."""
+    return KIND_PUBLISH_TIMES.get(kind) or PUBLISH_TIMES[exchange_of(kind)]
 
 class Fetcher(ABC):
     def __init__(self, kind: str):
         self.header = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36 Edg/134.0.0.0',
         }
+        # Shared pooled HTTP client, prefer self.get/self.post over calling requests directly
+        self.http = http_client
         self.kind = kind
-        match self.kind:
-            case 'US_STOCK' | 'US_FUND':
-                self.latest_value_date = latest_us_trading_day
-            case 'BTC':
-                self.latest_value_date = (datetime.now() + timedelta(hours=-15)).date()
+        # Data source host, concurrent requests to the same host are capped by the refresh scheduler
+        self.host = type(self).__name__
+        self.exchange = exchange_of(kind)
+
+    # Set by fetchers whose data is dated differently from their exchange's latest trading day
+    _latest_value_date = None
+
+    @property
+    def latest_value_date(self) -> date:
+        """Date of the latest value to expect, following the clock of utils.trading_day (see refresh_latest_trading_days)."""
+        if self._latest_value_date is not None:
+            return self._latest_value_date
+        match self.exchange:
+            case 'NYSE':
+                return trading_day.latest_us_trading_day
+            case 'CRYPTO':
+                return trading_day.latest_crypto_day
             case _:
-                self.latest_value_date = latest_china_trading_day
+                return trading_day.latest_china_trading_day
+
+    @latest_value_date.setter
+    def latest_value_date(self, value: date):
+        self._latest_value_date = value
 
     @abstractmethod
     def fetch_current_value(self, logger) -> tuple[Decimal | str, date | None]:
         pass
 
+    def get(self, url: str, **kwargs):
+        """GET through the shared HTTP client with the default headers, see HttpClient.request for the options."""
+        return self.http.get(url, headers={**self.header, **kwargs.pop('headers', {})}, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        """POST through the shared HTTP client with the default headers."""
+        return self.http.post(url, headers={**self.header, **kwargs.pop('headers', {})}, **kwargs)
+
     def fixed_composition(self) -> dict[str, Decimal] | None:
         return None
 
@@ -28,6 +83,23 @@ class Fetcher(ABC):
     def fetch_composition_update_time(self, logger) -> date:
         pass
 
+class AsyncFetcher(Fetcher):
+    """Fetcher implemented with coroutines, the refresh scheduler awaits them natively instead of using a thread."""
+
+    @abstractmethod
+    async def fetch_current_value_async(self, logger) -> tuple[Decimal | str, date | None]:
+        pass
+
+    @abstractmethod
+    async def fetch_composition_update_time_async(self, logger) -> date:
+        pass
+
+    def fetch_current_value(self, logger) -> tuple[Decimal | str, date | None]:
+        return asyncio.run(self.fetch_current_value_async(logger))
+
+    def fetch_composition_update_time(self, logger) -> date:
+        return asyncio.run(self.fetch_composition_update_time_async(logger))
+
 class MarketPriceFetcher(Fetcher):
     def __init__(self, kind: str):
         super().__init__(kind)
@@ -0,0 +1,190 @@
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+from fnmatch import fnmatch
+from utils.atomic_write import atomic_write
+
+logger = logging.getLogger('portfolio_rebalancer.http_cache')
+
+# Seconds a cached response is used without asking the server again, for the requests made inside cache_ttl(...)
+_cache_ttl = contextvars.ContextVar('cache_ttl', default=None)
+
+@contextmanager
+def cache_ttl(seconds: float):
+    """Use cached responses up to seconds old for the requests made in the with block, unless the request overrides it."""
+    token = _cache_ttl.set(seconds)
+    try:
+        yield
+    finally:
+        _cache_ttl.reset(token)
+
+class ResponseCache:
+    """
+    On-disk cache of GET responses, keyed by URL and query parameters.
+
+    A cached response younger than its TTL is returned without a request. An older one is revalidated with
+    If-None-Match/If-Modified-Since when the server sent an ETag/Last-Modified, and returned again on 304 Not Modified.
+    The TTL of a request is, in order: its cache_ttl argument, the enclosing cache_ttl(...) block,
+    the first of ttl_overrides ({fnmatch URL pattern: seconds}) matching its URL, then default_ttl.
+    With the default of 0 every response is revalidated, so cached data is never served unconfirmed.
+
+    Layout: <directory>/<xx>/<key>.json holds the status and headers, <key>.body the content.
+    """
+
+    PRUNED = 'pruned_at'
+
+    def __init__(self, directory: str = os.path.join('.cache', 'http'), default_ttl: float = 0,
+                 ttl_overrides: dict[str, float] | None = None, max_age_days: int = 30):
+        self.directory = directory
+        self.default_ttl = default_ttl
+        self.ttl_overrides = dict(ttl_overrides or {})
+        self.max_age_days = max_age_days
+        self.pruned = False
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(method: str, url: str, params=None) -> str:
+        if isinstance(params, dict):
+            params = sorted((str(k), str(v)) for k, v in params.items())
+        return hashlib.sha256(json.dumps([method.upper(), url, params], default=str).encode('utf-8')).hexdigest()
+
+    def ttl(self, url: str, ttl: float | None = None) -> float:
+        if ttl is not None:
+            return ttl
+        ttl = _cache_ttl.get()
+        if ttl is not None:
+            return ttl
+        for pattern, seconds in self.ttl_overrides.items():
+            if fnmatch(url, pattern):
+                return seconds
+        return self.default_ttl
+
+    def _paths(self, key: str) -> tuple[str, str]:
+        base = os.path.join(self.directory, key[:2], key)
+        return base + '.json', base + '.body'
+
+    def get(self, key: str) -> dict | None:
+        """The cached entry of a key with its content under 'body', None if there is none or it is damaged."""
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            with open(body_path, 'rb') as f:
+                entry['body'] = f.read()
+        except (OSError, ValueError):
+            return None
+        # the two files are replaced one after the other, a concurrent write can leave them mismatched
+        if len(entry['body']) != entry.get('size'):
+            return None
+        return entry
+
+    @staticmethod
+    def is_fresh(entry: dict, ttl: float) -> bool:
+        return time.time() - entry['stored_at'] < ttl
+
+    @staticmethod
+    def validators(entry: dict) -> dict[str, str]:
+        """Conditional request headers for revalidating an entry."""
+        headers = {}
+        if entry['headers'].get('ETag'):
+            headers['If-None-Match'] = entry['headers']['ETag']
+        if entry['headers'].get('Last-Modified'):
+            headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+        return headers
+
+    def store(self, key: str, response, ttl: float):
+        """
+        Cache a successful response, unless the server forbids it or the entry could never be used:
+        with a TTL of 0 and no ETag/Last-Modified it is neither fresh nor revalidatable.
+        """
+        if response.status_code != 200 or 'no-store' in response.headers.get('Cache-Control', ''):
+            return
+        if ttl <= 0 and not (response.headers.get('ETag') or response.headers.get('Last-Modified')):
+            return
+        body = response.content
+        entry = {
+            'url': response.url,
+            'status': response.status_code,
+            'reason': response.reason,
+            'encoding': response.encoding,
+            'headers': dict(response.headers),
+            'stored_at': time.time(),
+            'size': len(body),
+        }
+        self._write(key, entry, body)
+        self._prune_daily()
+
+    def revalidated(self, key: str, entry: dict, response):
+        """Refresh an entry after a 304 Not Modified, returns the cached response."""
+        entry = dict(entry)
+        body = entry.pop('body')
+        entry['headers'] = {**entry['headers'], **{k: v for k, v in response.headers.items() if k in ('ETag', 'Last-Modified', 'Cache-Control', 'Expires', 'Date')}}
+        entry['stored_at'] = time.time()
+        self._write(key, entry, body, write_body=False)
+        return self.response({**entry, 'body': body})
+
+    @staticmethod
+    def response(entry: dict):
+        """Build a requests.Response from a cached entry, its from_cache attribute is set."""
+        import requests
+        from requests.structures import CaseInsensitiveDict
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.reason = entry.get('reason')
+        response.url = entry['url']
+        response.encoding = entry.get('encoding')
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response._content = entry['body']
+        response.from_cache = True
+        return response
+
+    def _write(self, key: str, entry: dict, body: bytes, write_body: bool = True):
+        meta_path, body_path = self._paths(key)
+        try:
+            os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+            if write_body:
+                atomic_write(body_path, lambda f: f.write(body), encoding=None)
+            else:
+                # keep the body from being pruned along with the entry it still belongs to
+                os.utime(body_path)
+            atomic_write(meta_path, lambda f: json.dump(entry, f, ensure_ascii=False))
+        except OSError as e:
+            # the cache is an optimization, a failure to write it must not fail the fetch
+            logger.warning(f"Error writing HTTP cache {meta_path}: {e}")
+
+    def _prune_daily(self):
+        with self.lock:
+            if self.pruned:
+                return
+            self.pruned = True
+        pruned_path = os.path.join(self.directory, self.PRUNED)
+        if os.path.exists(pruned_path) and date.fromtimestamp(os.path.getmtime(pruned_path)) == date.today():
+            return
+        self.prune()
+        with open(pruned_path, 'w', encoding='utf-8') as f:
+            f.write(datetime.now().isoformat(timespec='seconds'))
+
+    def prune(self):
+        """Delete the entries not stored or revalidated within max_age_days."""
+        cutoff = time.time() - self.max_age_days * 86400
+        for prefix in os.listdir(self.directory):
+            prefix_path = os.path.join(self.directory, prefix)
+            if not os.path.isdir(prefix_path):
+                continue
+            for file_name in os.listdir(prefix_path):
+                file_path = os.path.join(prefix_path, file_name)
+                try:
+                    if os.path.getmtime(file_path) < cutoff:
+                        os.remove(file_path)
+                except OSError:
+                    pass
+            try:
+                os.rmdir(prefix_path)
+            except OSError:
+                pass
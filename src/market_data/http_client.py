@@ -0,0 +1,182 @@
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+from market_data.http_cache import ResponseCache
+from market_data.metrics import metrics
+
+# Responses worth retrying, other statuses are returned to the fetcher as they are
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Methods retried automatically, other methods are only retried when the caller passes retries
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD'})
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request to a host which failed too many times in a row."""
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60):
+        """
+        Opens after failure_threshold consecutive failed requests, then rejects requests for reset_timeout seconds.
+        After that a single trial request is let through, which closes it on success or opens it again on failure.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.trial_running:
+                return False
+            self.trial_running = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def release(self):
+        """End a request without a verdict on the host (e.g. an invalid URL), letting the next trial through."""
+        with self.lock:
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+class HttpClient:
+    """
+    HTTP client shared by all fetchers: one pooled keep-alive requests.Session per host,
+    default timeouts, retries of IDEMPOTENT_METHODS with exponential backoff and full jitter on connection errors and RETRY_STATUSES,
+    and a CircuitBreaker per host so that a dead data source fails fast instead of stalling every refresh.
+    GET responses are kept in cache, a ResponseCache, when one is given.
+    """
+
+    def __init__(self, timeout=(5, 20), retries: int = 3, backoff: float = 0.5, max_backoff: float = 8,
+                 pool_size: int = 8, failure_threshold: int = 5, reset_timeout: float = 60, cache: ResponseCache | None = None):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pool_size = pool_size
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.cache = cache
+        self.sessions = {}
+        self.breakers = {}
+        self.lock = threading.Lock()
+
+    def session(self, host: str):
+        """The pooled session of a host, created on first use."""
+        with self.lock:
+            session = self.sessions.get(host)
+            if session is None:
+                # imported here so that importing fetchers stays cheap when nothing is fetched
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self.sessions[host] = session
+            return session
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        with self.lock:
+            breaker = self.breakers.get(host)
+            if breaker is None:
+                breaker = self.breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return breaker
+
+    def request(self, method: str, url: str, retries: int | None = None, timeout=None, cache_ttl: float | None = None, **kwargs):
+        """
+        Send a request, retrying transient failures. Returns a requests.Response, whose from_cache tells if it came from the cache.
+        Only IDEMPOTENT_METHODS are retried by default, pass retries to retry others (e.g. a POST that only queries).
+        GET requests go through the response cache if the client has one, cache_ttl overrides its TTL (see ResponseCache).
+        """
+        cache = self.cache if method.upper() == 'GET' else None
+        cached = None
+        if cache is not None:
+            key = cache.key(method, url, kwargs.get('params'))
+            cached = cache.get(key)
+            if cached is not None:
+                if cache.is_fresh(cached, cache.ttl(url, cache_ttl)):
+                    metrics.record_request(0, cache_hit=True)
+                    return cache.response(cached)
+                kwargs['headers'] = {**(kwargs.get('headers') or {}), **cache.validators(cached)}
+
+        response = self._send(method, url, retries, timeout, **kwargs)
+        response.from_cache = False
+        if cache is not None and response.status_code == 304 and cached is not None:
+            metrics.record_request(0, cache_hit=True)
+            return cache.revalidated(key, cached, response)
+        if kwargs.get('stream'):
+            received = int(response.headers.get('Content-Length') or 0)
+        else:
+            received = len(response.content)
+        metrics.record_request(received, cache_hit=False if cache is not None else None)
+        # reading the content of a streamed response to store it would defeat the streaming
+        if cache is not None and not kwargs.get('stream'):
+            cache.store(key, response, cache.ttl(url, cache_ttl))
+        return response
+
+    def _send(self, method: str, url: str, retries: int | None, timeout, **kwargs):
+        import requests
+        host = urlsplit(url).netloc
+        breaker = self.breaker(host)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Too many failures from {host}, not retrying for now.")
+        if retries is None:
+            retries = self.retries if method.upper() in IDEMPOTENT_METHODS else 0
+        timeout = self.timeout if timeout is None else timeout
+
+        # every way out records a result or releases the breaker, otherwise a half-open trial would block the host for good
+        recorded = False
+        try:
+            session = self.session(host)
+            for attempt in range(retries + 1):
+                try:
+                    response = session.request(method, url, timeout=timeout, **kwargs)
+                except (requests.ConnectionError, requests.Timeout):
+                    if attempt == retries:
+                        breaker.record_failure()
+                        recorded = True
+                        raise
+                    metrics.record_retry()
+                    time.sleep(self._delay(attempt))
+                    continue
+                if response.status_code in RETRY_STATUSES and attempt < retries:
+                    metrics.record_retry()
+                    time.sleep(self._delay(attempt, response.headers.get('Retry-After')))
+                    continue
+                if response.status_code in RETRY_STATUSES:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                recorded = True
+                return response
+        finally:
+            if not recorded:
+                breaker.release()
+
+    def get(self, url: str, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def _delay(self, attempt: int, retry_after: str | None = None) -> float:
+        if retry_after is not None and retry_after.isdigit():
+            return min(float(retry_after), self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+http_client = HttpClient(cache=ResponseCache())
@@ -1,29 +1,65 @@
 from decimal import Decimal
 from datetime import datetime, date, timedelta
+import atexit
 import os
-import json
-import shutil
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from types import MappingProxyType
+from typing import Mapping
 import simplejson
 from market_data import market_fetcher
 from market_data.FX import ExchangeRate
+from market_data.store import HOLDING_PARTS, open_market_store
+from market_data.http_cache import cache_ttl
+from market_data.retry_schedule import RetrySchedule
+from market_data.metrics import metrics
 from market_data.delay_update import DelayedUpdateError
-from market_data.fetcher import MarketPriceFetcher
+from utils.atomic_write import atomic_write
+from utils.trading_day import refresh_latest_trading_days
+from market_data.scheduler import RefreshScheduler, RefreshJob, RefreshCancelled
+from market_data.fetcher import AsyncFetcher, MarketPriceFetcher, ETF联接Fetcher
 
 class Market:
+    # Concurrency of prefetch, in total, per data source host and per fetcher kind, and the time limit of a single fetch
+    prefetch_workers = 8
+    prefetch_host_limit = 2
+    prefetch_kind_limits = {'default': 2}
+    fetch_timeout = 60
+    # An exchange rate dated D is used until D + 1 day 15 hours
+    exchange_rate_ttl = timedelta(days=1, hours=15)
+    # Seconds a market price mode quote stays fresh, per fetcher kind
+    quote_ttl = {'default': 60}
+    # Seconds cached composition date pages are used without asking the data source, they change a few times a year
+    composition_cache_ttl = 24 * 3600
+
     def __init__(self, market_data_file_path, logger):
         self.logger = logger
+        self.lock = threading.RLock()
         self.file_path = market_data_file_path
         self.FX = ExchangeRate(self.logger)
-        self.update_delayed = set()
+        self.scheduler = RefreshScheduler(self.prefetch_workers, self.prefetch_host_limit, self.prefetch_kind_limits, self.fetch_timeout)
+        # when symbols which could not be fetched may be tried again
+        self.retry_schedule = RetrySchedule(os.path.splitext(self.file_path)[0] + '.retry.json', self.logger)
         self.market_price_mode = False
+        # symbol -> the HOLDING_PARTS of it which changed
+        self.dirty_symbols: dict[str, set[str]] = {}
+        self.dirty_exchange_rates = set()
+        # look-through composition cache, see get_composition
+        self.look_through = {}
+        self.composition_dependents = {}
+        # symbol -> {'reason', 'update_at'} of compositions waiting for user input,
+        # also kept as 'pending_composition' of the holding so that it survives restarts
+        self.pending_compositions = {}
+        # symbol -> (market price, time.monotonic() of the fetch)
+        self.quotes = {}
 
-        if not os.path.exists(self.file_path):
+        self.store = open_market_store(self.file_path, self.logger)
+        if not self.store.exists():
             self.logger.error(f"Market data file not found: {self.file_path}")
             return {}
 
-        with open(self.file_path, 'r', encoding='utf-8') as f:
-            self.data = json.load(f, parse_float=Decimal)
         self.init_data = {
             'update_at': '0001-01-01',
             'value': 0,
@@ -33,31 +69,63 @@ class Market:
                 'unknown': 1
             }
         }
-        self.check()
+        self.load()
+        # write back whatever is still pending when the process exits
+        atexit.register(self.flush)
 
-    def update_market_data(self):
-        self.check()
-        data = self.data
-        if not data:
-            self.logger.error("Market data is not available.")
-            return
-        if not getattr(self, 'history_saved', False):
-            # make sure .history folder is created
-            # save self.file_path to .history with timestamp
-            if not os.path.exists('.history'):
-                os.makedirs('.history')
-            history_file_path = os.path.join('.history', f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.path.basename(self.file_path)}")
-            # copy self.file_path to history_file_path, not json dump
-            shutil.copyfile(self.file_path, history_file_path)
-            self.history_saved = True
-        # store back to file_path
-        with open(self.file_path, 'w', encoding='utf-8') as f:
-            simplejson.dump(data, f, ensure_ascii=False, indent='\t')
-        self.logger.info("Market data updated successfully.")
-        time.sleep(1)
-
-    def check(self):
-        for symbol, info in {**{'unknown': self.init_data}, **self.data['holdings']}.items():
+    def load(self):
+        """Read the market data from the store, dropping what was derived from the previous data."""
+        with self.lock:
+            self.data = self.store.load()
+            self.check()
+            self.pending_compositions = {
+                symbol: info['pending_composition'] for symbol, info in self.data['holdings'].items() if 'pending_composition' in info
+            }
+            self.look_through.clear()
+            self.composition_dependents.clear()
+            self.index_currencies()
+            for info in self.data['holdings'].values():
+                if isinstance(info['value'], str):
+                    self.parse_price(info['value'])
+
+    def reload(self):
+        """Write the changes of this process, then pick up the rows other processes sharing the store changed."""
+        with self.lock:
+            self.flush()
+            self.load()
+
+    def mark_dirty(self, symbol: str | None = None, currency: str | None = None, parts=HOLDING_PARTS):
+        """Record changed parts (see HOLDING_PARTS) of a symbol or a changed exchange rate, to be written by the next flush."""
+        with self.lock:
+            if symbol is not None:
+                self.dirty_symbols.setdefault(symbol, set()).update(parts)
+            if currency is not None:
+                self.dirty_exchange_rates.add(currency)
+
+    def flush(self):
+        """Write the changed symbols and exchange rates back to the market data store."""
+        with self.lock:
+            self.retry_schedule.save()
+            if not self.dirty_symbols and not self.dirty_exchange_rates:
+                return
+            data = self.data
+            if not data:
+                self.logger.error("Market data is not available.")
+                return
+            self.check(self.dirty_symbols)
+            self.store.save(data, self.dirty_symbols, self.dirty_exchange_rates)
+            self.logger.info(f"Market data updated successfully ({len(self.dirty_symbols)} symbols, {len(self.dirty_exchange_rates)} exchange rates).")
+            self.dirty_symbols.clear()
+            self.dirty_exchange_rates.clear()
+
+    def export_json(self, json_path):
+        """Write the in-memory market data as a JSON file, whatever the storage backend is."""
+        with self.lock:
+            atomic_write(json_path, lambda f: simplejson.dump(self.data, f, ensure_ascii=False, indent='\t'))
+
+    def check(self, symbols=None):
+        holdings = self.data['holdings'] if symbols is None else {symbol: self.data['holdings'][symbol] for symbol in symbols}
+        for symbol, info in {**{'unknown': self.init_data}, **holdings}.items():
             if 'value' not in info or 'update_at' not in info or 'composition' not in info:
                 self.logger.error(f"Missing property for symbol {symbol}.")
                 raise ValueError(f"Missing property for symbol {symbol}.")
@@ -79,22 +147,173 @@ class Market:
                 self.logger.error(f"Total percentage for symbol {symbol} is not equal to 1.")
                 raise ValueError(f"Total percentage for symbol {symbol} is not equal to 1.")
 
-    def get_composition(self, symbol: str) -> dict[str, Decimal]:
+    def get_composition(self, symbol: str) -> Mapping[str, Decimal]:
+        """
+        Flattened composition of a symbol, with every fund it holds (e.g. the ETF of an ETF联接 fund,
+        at any depth) replaced by that fund's own look-through composition.
+        Rows are cached until the symbol or one of its underlying funds is refreshed.
+        """
+        row = self.look_through.get(symbol)
+        if row is not None:
+            # refresh expired members first, which invalidates this row
+            for member in row[1]:
+                self.get_symbol(member)
+            row = self.look_through.get(symbol)
+        if row is None:
+            row = self._resolve_composition(symbol, ())
+        return row[0]
+
+    def underlying_funds(self, symbol: str) -> dict[str, str]:
+        """Assets in the composition of a symbol which are funds themselves, mapped to their symbols."""
+        if self.data['holdings'][symbol]['kind'] == 'ETF联接':
+            return {'ETF': market_fetcher[symbol].ETF}
+        return {}
+
+    def _resolve_composition(self, symbol: str, path: tuple[str, ...]):
+        if symbol in path:
+            cycle = ' -> '.join(path[path.index(symbol):] + (symbol,))
+            self.logger.error(f"Composition cycle detected: {cycle}.")
+            raise ValueError(f"Composition cycle detected: {cycle}.")
+        row = self.look_through.get(symbol)
+        if row is not None:
+            return row
+        path = path + (symbol,)
+
         symbol_data = self.get_symbol(symbol)
-        ret = symbol_data['composition'].copy()
-        del ret['update_at']
-        if symbol_data['kind'] == 'ETF联接':
-            # change the 'ETF' composition to its corresponding 'ETF' symbol's composition
-            etf_pct = ret['ETF']
-            del ret['ETF']
-            etf_composition = self.get_symbol(market_fetcher[symbol].ETF)['composition']
-            for asset, percentage in etf_composition.items():
-                if asset == 'update_at':
-                    continue
-                if asset not in ret:
-                    ret[asset] = 0
-                ret[asset] += percentage * etf_pct
-        return ret
+        underlying = self.underlying_funds(symbol)
+        weights = {}
+        members = {symbol}
+        for asset, percentage in symbol_data['composition'].items():
+            if asset == 'update_at':
+                continue
+            if asset in underlying:
+                fund = underlying[asset]
+                fund_weights, fund_members = self._resolve_composition(fund, path)
+                members |= fund_members
+                with self.lock:
+                    self.composition_dependents.setdefault(fund, set()).add(symbol)
+                for fund_asset, fund_percentage in fund_weights.items():
+                    weights[fund_asset] = weights.get(fund_asset, 0) + fund_percentage * percentage
+            else:
+                weights[asset] = weights.get(asset, 0) + percentage
+
+        row = (MappingProxyType(weights), frozenset(members))
+        with self.lock:
+            self.look_through[symbol] = row
+        return row
+
+    def invalidate_composition(self, symbol: str):
+        """Drop the cached look-through rows of a symbol and of every fund holding it."""
+        with self.lock:
+            pending = [symbol]
+            while pending:
+                current = pending.pop()
+                self.look_through.pop(current, None)
+                pending.extend(self.composition_dependents.pop(current, ()))
+
+    def is_expired(self, symbol: str) -> bool:
+        """
+        Whether the stored data of a symbol is older than its fetcher's latest value date
+        and it is due to be fetched, according to the retry schedule of the symbols which failed before.
+        """
+        if symbol not in market_fetcher:
+            return False
+        holding = self.data['holdings'].setdefault(symbol, self.init_data.copy())
+        expired_time = datetime.strptime(holding['update_at'], '%Y-%m-%d').date()
+        latest_value_date = market_fetcher[symbol].latest_value_date
+        return expired_time < latest_value_date and self.retry_schedule.is_due(symbol, latest_value_date)
+
+    def fetch_symbol(self, symbol: str):
+        """Fetch the latest value and composition date of a symbol without touching the stored data."""
+        fetcher = market_fetcher[symbol]
+        # checked inside the span, so that a late publish is recorded as delayed
+        with metrics.span(symbol, fetcher, 'fetch_current_value'):
+            (value, value_date) = fetcher.fetch_current_value(self.logger)
+            if value_date is not None and value_date < fetcher.latest_value_date:
+                raise DelayedUpdateError("latest data is not available.")
+        fixed_composition = fetcher.fixed_composition()
+        composition_update_time = None
+        if fixed_composition is None:
+            with cache_ttl(self.composition_cache_ttl), metrics.span(symbol, fetcher, 'fetch_composition_update_time'):
+                composition_update_time = fetcher.fetch_composition_update_time(self.logger)
+        return value, value_date, fixed_composition, composition_update_time
+
+    async def fetch_symbol_async(self, symbol: str):
+        """fetch_symbol for AsyncFetcher symbols."""
+        fetcher = market_fetcher[symbol]
+        # checked inside the span, so that a late publish is recorded as delayed
+        with metrics.span(symbol, fetcher, 'fetch_current_value'):
+            (value, value_date) = await fetcher.fetch_current_value_async(self.logger)
+            if value_date is not None and value_date < fetcher.latest_value_date:
+                raise DelayedUpdateError("latest data is not available.")
+        fixed_composition = fetcher.fixed_composition()
+        composition_update_time = None
+        if fixed_composition is None:
+            with cache_ttl(self.composition_cache_ttl), metrics.span(symbol, fetcher, 'fetch_composition_update_time'):
+                composition_update_time = await fetcher.fetch_composition_update_time_async(self.logger)
+        return value, value_date, fixed_composition, composition_update_time
+
+    def store_symbol(self, symbol: str, value, value_date, fixed_composition, composition_update_time):
+        """Store the result of fetch_symbol into the market data."""
+        with self.lock:
+            holding = self.data['holdings'][symbol]
+            holding['kind'] = market_fetcher[symbol].kind
+            holding['value'] = value
+            # the composition is only written back if it changed, so that it does not overwrite one entered in another process
+            parts = {'value'}
+            if fixed_composition is not None:
+                holding['composition'] = {**fixed_composition, 'update_at': '0001-01-01'}
+                holding.pop('pending_composition', None)
+                self.pending_compositions.pop(symbol, None)
+                parts.add('composition')
+            else:
+                prev_update_time = datetime.strptime(holding['composition']['update_at'], '%Y-%m-%d').date()
+                if composition_update_time > prev_update_time or prev_update_time < date.today() - timedelta(days=100):
+                    # keep the current composition and let the user resolve it later, see resolve_compositions
+                    if composition_update_time > prev_update_time:
+                        reason = 'The composition data has been updated.'
+                    else:
+                        reason = 'The composition data is older than 100 days.'
+                    # stored with the holding, update_at of the holding moves on below and would hide the change after a restart
+                    holding['pending_composition'] = self.pending_compositions[symbol] = {
+                        'reason': reason,
+                        'update_at': composition_update_time.strftime('%Y-%m-%d'),
+                    }
+                    parts.add('composition')
+                    self.logger.warning(f"Composition of {symbol} is stale: {reason}")
+            holding['update_at'] = (value_date or date.today()).strftime('%Y-%m-%d')
+            self.retry_schedule.clear(symbol)
+            self.invalidate_composition(symbol)
+            self.mark_dirty(symbol, parts=parts)
+
+    def is_composition_stale(self, symbol: str) -> bool:
+        """Whether a newer composition of the symbol is waiting to be entered."""
+        return symbol in self.pending_compositions
+
+    def resolve_compositions(self, compositions: dict[str, dict[str, Decimal] | None]):
+        """
+        Apply new compositions for pending symbols, None or an empty dict confirms the current one.
+        The compositions are stamped with today's date and written in one flush.
+        """
+        with self.lock:
+            for symbol, composition in compositions.items():
+                holding = self.data['holdings'][symbol]
+                if composition:
+                    composition = dict(composition)
+                    if sum(composition.values()) != 1:
+                        composition['cashPos'] = 1 - sum(composition.values())
+                else:
+                    # no update
+                    composition = holding['composition'].copy()
+                    del composition['update_at']
+                    assert sum(composition.values()) == 1
+                holding['composition'] = composition
+                holding['composition']['update_at'] = date.today().strftime('%Y-%m-%d')
+                holding.pop('pending_composition', None)
+                self.pending_compositions.pop(symbol, None)
+                self.invalidate_composition(symbol)
+                self.mark_dirty(symbol, parts={'composition'})
+            self.flush()
 
     def get_symbol(self, symbol: str):
         holdings = self.data['holdings']
@@ -107,74 +326,219 @@ class Market:
                 self.warned.add(symbol)
                 self.logger.warning(f"{symbol} has no fetcher defined.")
             return holdings[symbol]
-        expired_time = datetime.strptime(holdings[symbol]['update_at'], '%Y-%m-%d').date()
-        if expired_time < market_fetcher[symbol].latest_value_date and symbol in market_fetcher and symbol not in self.update_delayed:
+        if self.is_expired(symbol):
             self.logger.info(f"Fetching new data for {symbol}.")
             try:
-                holdings[symbol]['kind'] = market_fetcher[symbol].kind
-                (value, value_date) = market_fetcher[symbol].fetch_current_value(self.logger)
-                if value_date is not None and value_date < market_fetcher[symbol].latest_value_date:
-                    raise DelayedUpdateError("latest data is not available.")
-                holdings[symbol]['value'] = value
-                if market_fetcher[symbol].fixed_composition() is not None:
-                    holdings[symbol]['composition'] = market_fetcher[symbol].fixed_composition()
-                    holdings[symbol]['composition']['update_at'] = '0001-01-01'
-                else:
-                    composition_update_time = market_fetcher[symbol].fetch_composition_update_time(self.logger)
-                    prev_update_time = datetime.strptime(holdings[symbol]['composition']['update_at'], '%Y-%m-%d').date()
-                    if composition_update_time > prev_update_time or prev_update_time < date.today() - timedelta(days=100):
-                        if composition_update_time > prev_update_time:
-                            prompt = 'The composition data has been updated. Please enter the new composition data: '
-                        else:
-                            prompt = 'The composition data is older than 100 days. Please enter the new composition data: '
-
-                        composition_str = input(prompt)
-                        composition = {}
-                        if composition_str:
-                            composition_str = composition_str.replace('=', ':')
-                            for asset in composition_str.split(';'):
-                                name, percentage = asset.split(':')
-                                composition[name] = Decimal(percentage)
-                            if sum(composition.values()) != 1:
-                                composition['cashPos'] = 1 - sum(composition.values())
-                        else:
-                            # no update
-                            composition = holdings[symbol]['composition'].copy()
-                            del composition['update_at']
-                            assert sum(composition.values()) == 1
-                        holdings[symbol]['composition'] = composition
-                        holdings[symbol]['composition']['update_at'] = date.today().strftime('%Y-%m-%d')
-                holdings[symbol]['update_at'] = (value_date or date.today()).strftime('%Y-%m-%d')
-                self.update_market_data()
+                self.store_symbol(symbol, *self.fetch_symbol(symbol))
             except DelayedUpdateError as e:
-                self.logger.warn(f"Delayed update for {symbol}: {e}")
-                self.update_delayed.add(symbol)
+                self.schedule_retry(symbol, e)
             except Exception as e:
                 self.logger.error(f"Failed to fetch data for {symbol}: {e}")
+                self.schedule_retry(symbol, e)
                 raise
         return holdings[symbol]
 
+    def prefetch(self, symbols=None, cancel: threading.Event | None = None, progress=None):
+        """
+        Fetch all expired symbols (and the ETFs behind ETF联接 funds) concurrently,
+        so that later get_symbol/get_price calls are served from memory.
+        Failures are logged and scheduled for a retry (see RetrySchedule), get_symbol or a later prefetch retries them once due.
+        Setting cancel stops the fetches still running, what already arrived is kept.
+        progress(done, total) is called as the fetches finish, see RefreshScheduler.run.
+        """
+        # the process may have been running since before the latest trading day moved on
+        refresh_latest_trading_days()
+        try:
+            self.refresh_exchange_rates()
+        except Exception as e:
+            self.logger.error(f"Failed to fetch exchange rates: {e}")
+
+        queue = list(self.data['holdings'] if symbols is None else symbols)
+        seen = set()
+        expired_by_kind: dict[str, list[str]] = {}
+        while queue:
+            symbol = queue.pop(0)
+            if symbol in seen or symbol not in market_fetcher:
+                continue
+            seen.add(symbol)
+            fetcher = market_fetcher[symbol]
+            if isinstance(fetcher, ETF联接Fetcher):
+                queue.append(fetcher.ETF)
+            if self.is_expired(symbol):
+                expired_by_kind.setdefault(fetcher.kind, []).append(symbol)
+        if not expired_by_kind:
+            self.flush()
+            return
+
+        expired = [symbol for symbols in expired_by_kind.values() for symbol in symbols]
+        self.logger.info(f"Prefetching {len(expired)} symbols: {', '.join(expired)}.")
+        for symbol, result in self.fetch_concurrently(expired, self.fetch_symbol, self.fetch_symbol_async, cancel, progress):
+            try:
+                self.store_symbol(symbol, *result())
+            except RefreshCancelled:
+                pass
+            except DelayedUpdateError as e:
+                self.schedule_retry(symbol, e)
+            except Exception as e:
+                self.logger.error(f"Failed to prefetch data for {symbol}: {e}")
+                self.schedule_retry(symbol, e)
+        self.flush()
+
+    def schedule_retry(self, symbol: str, error: Exception):
+        """Record a failed fetch of a symbol, is_expired skips it until the retry schedule says it is due."""
+        fetcher = market_fetcher[symbol]
+        if isinstance(error, DelayedUpdateError):
+            retry_at = self.retry_schedule.record_delay(symbol, fetcher.kind, fetcher.latest_value_date, str(error))
+            self.logger.warn(f"Delayed update for {symbol}: {error} Retrying after {retry_at:%Y-%m-%d %H:%M %Z}.")
+        else:
+            self.retry_schedule.record_failure(symbol, fetcher.latest_value_date, str(error))
+
+    def fetch_concurrently(self, symbols: list[str], fetch, fetch_async=None, cancel: threading.Event | None = None, progress=None):
+        """
+        Run fetch(symbol) for every symbol through the refresh scheduler, or await fetch_async(symbol) for AsyncFetcher symbols.
+        Yields (symbol, result) in the order of symbols, where result() returns the fetched value or raises its exception.
+        """
+        jobs = []
+        for symbol in dict.fromkeys(symbols):
+            fetcher = market_fetcher[symbol]
+            if fetch_async is not None and isinstance(fetcher, AsyncFetcher):
+                jobs.append(RefreshJob(symbol, partial(fetch_async, symbol), fetcher.host, fetcher.kind, is_async=True))
+            else:
+                jobs.append(RefreshJob(symbol, partial(fetch, symbol), fetcher.host, fetcher.kind))
+        results = self.scheduler.run(jobs, cancel, progress)
+        for symbol in symbols:
+            yield symbol, results[symbol]
+
+    def is_quote_fresh(self, symbol: str) -> bool:
+        quote = self.quotes.get(symbol)
+        if quote is None:
+            return False
+        ttl = self.quote_ttl.get(market_fetcher[symbol].kind, self.quote_ttl['default'])
+        return time.monotonic() - quote[1] < ttl
+
+    def prefetch_quotes(self, symbols=None, cancel: threading.Event | None = None, progress=None):
+        """Fetch the market price of every MarketPriceFetcher symbol without a fresh quote, concurrently."""
+        stale = [
+            symbol for symbol in dict.fromkeys(self.data['holdings'] if symbols is None else symbols)
+            if isinstance(market_fetcher.get(symbol), MarketPriceFetcher) and not self.is_quote_fresh(symbol)
+        ]
+        if stale:
+            self.logger.info(f"Fetching market prices for {len(stale)} symbols.")
+        for symbol, result in self.fetch_concurrently(stale, self.fetch_quote, cancel=cancel, progress=progress):
+            try:
+                self.store_quote(symbol, result())
+            except RefreshCancelled:
+                pass
+            except Exception as e:
+                self.logger.error(f"Failed to fetch market price for {symbol}: {e}")
+
+    def fetch_quote(self, symbol: str):
+        fetcher = market_fetcher[symbol]
+        with metrics.span(symbol, fetcher, 'fetch_current_market_price'):
+            return fetcher.fetch_current_market_price(self.logger)
+
+    def store_quote(self, symbol: str, price):
+        if price is not None:
+            with self.lock:
+                self.quotes[symbol] = (price, time.monotonic())
+
+    def get_quote(self, symbol: str):
+        """Market price of a symbol from the quote cache, fetched if missing or older than its kind's quote_ttl."""
+        if not self.is_quote_fresh(symbol):
+            try:
+                self.store_quote(symbol, self.fetch_quote(symbol))
+            except Exception as e:
+                self.logger.error(f"Failed to fetch market price for {symbol}: {e}")
+        quote = self.quotes.get(symbol)
+        return quote[0] if quote is not None else None
+
     def iter_symbols(self):
         for symbol in self.data['holdings']:
             yield symbol, self.get_symbol(symbol)
 
     def get_price(self, symbol: str) -> Decimal:
         value = self.get_symbol(symbol)['value']
-        if self.market_price_mode and isinstance(market_fetcher[symbol], MarketPriceFetcher):
-            try:
-                market_value = market_fetcher[symbol].fetch_current_market_price(self.logger)
-                value = market_value if market_value is not None else value
-            except Exception as e:
-                self.logger.error(f"Failed to fetch market price for {symbol}: {e}")
+        if self.market_price_mode and isinstance(market_fetcher.get(symbol), MarketPriceFetcher):
+            market_value = self.get_quote(symbol)
+            value = market_value if market_value is not None else value
         if isinstance(value, Decimal) or isinstance(value, int):
             return value
-        for currency, info in self.data['exchange_rate'].items():
-            if value.startswith(info['symbol']):
-                value = Decimal(value[len(info['symbol']):])
-                expired_time = datetime.strptime(info['update_at'], '%Y-%m-%d') + timedelta(days=1, hours=15)
-                if expired_time < datetime.now():
-                    info['rate'] = self.FX.get_exchange_rate(currency)
-                    info['update_at'] = (datetime.now() + timedelta(hours=-15)).strftime('%Y-%m-%d')
-                    self.update_market_data()
-                return value * info['rate']
-        raise ValueError(f"Unsupported currency: {currency}")
+        amount, currency = self.parse_price(value)
+        return amount * self.get_exchange_rate(currency)
+
+    def index_currencies(self):
+        """Rebuild the currency prefix index and the cross rates from the exchange rate data."""
+        with self.lock:
+            exchange_rate = self.data.get('exchange_rate', {})
+            # longest prefix first, so that e.g. 'HK$' wins over '$'
+            self.currency_prefixes = sorted(((info['symbol'], currency) for currency, info in exchange_rate.items()), key=lambda item: -len(item[0]))
+            self.rate_expires_at = {
+                currency: datetime.strptime(info['update_at'], '%Y-%m-%d') + self.exchange_rate_ttl
+                for currency, info in exchange_rate.items()
+            }
+            self.cross_rates = {
+                (from_currency, to_currency): Decimal(from_info['rate']) / Decimal(to_info['rate'])
+                for from_currency, from_info in exchange_rate.items()
+                for to_currency, to_info in exchange_rate.items()
+                if to_info['rate']
+            }
+            self.parsed_prices = {}
+
+    def parse_price(self, value: str) -> tuple[Decimal, str]:
+        """Split a price like '$123.4' into its amount and currency, parsed once per distinct string."""
+        parsed = self.parsed_prices.get(value)
+        if parsed is None:
+            for prefix, currency in self.currency_prefixes:
+                if value.startswith(prefix):
+                    parsed = (Decimal(value[len(prefix):]), currency)
+                    break
+            else:
+                raise ValueError(f"Unsupported currency: {value}")
+            self.parsed_prices[value] = parsed
+        return parsed
+
+    def get_exchange_rate(self, currency: str) -> Decimal:
+        """Rate converting the currency to the base currency, refreshing every expired rate at once if needed."""
+        if self.rate_expires_at[currency] < datetime.now():
+            self.refresh_exchange_rates()
+        return self.data['exchange_rate'][currency]['rate']
+
+    def convert(self, amount: Decimal, from_currency: str, to_currency: str | None = None) -> Decimal:
+        """Convert an amount between two currencies of the exchange rate data, or to the base currency if to_currency is None."""
+        if to_currency is None:
+            return amount * self.get_exchange_rate(from_currency)
+        if max(self.rate_expires_at[from_currency], self.rate_expires_at[to_currency]) < datetime.now():
+            self.refresh_exchange_rates()
+        return amount * self.cross_rates[(from_currency, to_currency)]
+
+    def refresh_exchange_rates(self):
+        """Fetch all expired exchange rates in one batch, through FX.get_exchange_rates if the FX module provides it."""
+        now = datetime.now()
+        expired = [currency for currency, expires_at in self.rate_expires_at.items() if expires_at < now]
+        if not expired:
+            return
+        self.logger.info(f"Fetching exchange rates for {', '.join(expired)}.")
+        if hasattr(self.FX, 'get_exchange_rates'):
+            rates = self.FX.get_exchange_rates(expired)
+        else:
+            with ThreadPoolExecutor(max_workers=len(expired)) as executor:
+                rates = dict(zip(expired, executor.map(self.FX.get_exchange_rate, expired)))
+        with self.lock:
+            for currency in expired:
+                info = self.data['exchange_rate'][currency]
+                info['rate'] = rates[currency]
+                info['update_at'] = (now + timedelta(hours=-15)).strftime('%Y-%m-%d')
+                self.mark_dirty(currency=currency)
+            self.index_currencies()
+
+def parse_composition(composition_str: str) -> dict[str, Decimal]:
+    """Parse a composition entered as 'asset:percentage;asset=percentage', an empty string gives an empty dict."""
+    composition = {}
+    if composition_str.strip():
+        composition_str = composition_str.replace('=', ':')
+        for asset in composition_str.split(';'):
+            if not asset.strip():
+                continue
+            name, percentage = asset.split(':')
+            composition[name.strip()] = Decimal(percentage.strip())
+    return composition
@@ -0,0 +1,225 @@
+import asyncio
+import bisect
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+from utils.atomic_write import atomic_write
+from market_data.delay_update import DelayedUpdateError
+from market_data.scheduler import RefreshCancelled
+
+# Upper bounds in seconds of the fetch latency histogram buckets
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Span of the fetch running in the current thread or task, the HTTP client adds its requests to it
+_current_span = contextvars.ContextVar('fetch_span', default=None)
+
+class FetchSpan:
+    def __init__(self, symbol: str, fetcher: str, host: str, kind: str, operation: str):
+        self.symbol = symbol
+        self.fetcher = fetcher
+        self.host = host
+        self.kind = kind
+        self.operation = operation
+        self.outcome = 'ok'
+        self.seconds = 0.0
+        self.requests = 0
+        self.bytes = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+class _Aggregate:
+    def __init__(self):
+        self.count = 0
+        self.outcomes: dict[str, int] = {}
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.requests = 0
+        self.bytes = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def add(self, span: FetchSpan):
+        self.count += 1
+        self.outcomes[span.outcome] = self.outcomes.get(span.outcome, 0) + 1
+        self.seconds += span.seconds
+        self.max_seconds = max(self.max_seconds, span.seconds)
+        index = bisect.bisect_left(LATENCY_BUCKETS, span.seconds)
+        if index < len(self.buckets):
+            self.buckets[index] += 1
+        self.requests += span.requests
+        self.bytes += span.bytes
+        self.retries += span.retries
+        self.cache_hits += span.cache_hits
+        self.cache_misses += span.cache_misses
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'outcomes': dict(self.outcomes),
+            'seconds': round(self.seconds, 6),
+            'mean_seconds': round(self.seconds / self.count, 6) if self.count else 0,
+            'max_seconds': round(self.max_seconds, 6),
+            'requests': self.requests,
+            'bytes': self.bytes,
+            'retries': self.retries,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+        }
+
+class FetchMetrics:
+    """
+    Latency, outcome and HTTP traffic of every fetch, aggregated per fetcher class, host, kind and operation, and per symbol.
+
+    Market wraps fetcher calls in span(...), HttpClient reports the requests made inside one through record_request and record_retry.
+    The aggregates are exported with to_prometheus (text exposition format), to_json and report (a table for the terminal).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.aggregates: dict[tuple[str, str, str, str], _Aggregate] = {}
+        self.symbols: dict[tuple[str, str], _Aggregate] = {}
+
+    @contextmanager
+    def span(self, symbol: str, fetcher, operation: str):
+        """Record the fetch in the with block, its outcome is taken from the exception leaving it, if any."""
+        span = FetchSpan(symbol, type(fetcher).__name__, fetcher.host, fetcher.kind, operation)
+        token = _current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except DelayedUpdateError:
+            span.outcome = 'delayed'
+            raise
+        except TimeoutError:
+            span.outcome = 'timeout'
+            raise
+        except (RefreshCancelled, asyncio.CancelledError):
+            span.outcome = 'cancelled'
+            raise
+        except BaseException:
+            span.outcome = 'error'
+            raise
+        finally:
+            span.seconds = time.perf_counter() - start
+            _current_span.reset(token)
+            self.record(span)
+
+    def record(self, span: FetchSpan):
+        with self.lock:
+            key = (span.fetcher, span.host, span.kind, span.operation)
+            self.aggregates.setdefault(key, _Aggregate()).add(span)
+            self.symbols.setdefault((span.symbol, span.operation), _Aggregate()).add(span)
+
+    @staticmethod
+    def record_request(bytes: int, cache_hit: bool | None = None):
+        """
+        Add an HTTP request to the span of the current fetch, if there is one.
+        bytes is what was received over the network, cache_hit is None for requests the cache does not apply to.
+        """
+        span = _current_span.get()
+        if span is None:
+            return
+        span.requests += 1
+        span.bytes += bytes
+        if cache_hit is True:
+            span.cache_hits += 1
+        elif cache_hit is False:
+            span.cache_misses += 1
+
+    @staticmethod
+    def record_retry():
+        span = _current_span.get()
+        if span is not None:
+            span.retries += 1
+
+    def reset(self):
+        with self.lock:
+            self.aggregates.clear()
+            self.symbols.clear()
+
+    def to_json(self) -> dict:
+        with self.lock:
+            return {
+                'fetchers': [
+                    {'fetcher': fetcher, 'host': host, 'kind': kind, 'operation': operation, **aggregate.to_dict()}
+                    for (fetcher, host, kind, operation), aggregate in sorted(self.aggregates.items(), key=lambda item: -item[1].seconds)
+                ],
+                'symbols': [
+                    {'symbol': symbol, 'operation': operation, **aggregate.to_dict()}
+                    for (symbol, operation), aggregate in sorted(self.symbols.items(), key=lambda item: -item[1].seconds)
+                ],
+            }
+
+    def to_prometheus(self) -> str:
+        lines = []
+        def metric(name: str, kind: str, help: str):
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self.lock:
+            aggregates = [(self._labels(fetcher=fetcher, host=host, kind=kind, operation=operation), aggregate) for (fetcher, host, kind, operation), aggregate in sorted(self.aggregates.items())]
+
+        metric('market_fetch_total', 'counter', 'Fetches by outcome.')
+        for labels, aggregate in aggregates:
+            for outcome, count in sorted(aggregate.outcomes.items()):
+                lines.append(f"market_fetch_total{{{labels},outcome=\"{outcome}\"}} {count}")
+        metric('market_fetch_duration_seconds', 'histogram', 'Fetch latency.')
+        for labels, aggregate in aggregates:
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, aggregate.buckets):
+                cumulative += count
+                lines.append(f"market_fetch_duration_seconds_bucket{{{labels},le=\"{bound}\"}} {cumulative}")
+            lines.append(f"market_fetch_duration_seconds_bucket{{{labels},le=\"+Inf\"}} {aggregate.count}")
+            lines.append(f"market_fetch_duration_seconds_sum{{{labels}}} {aggregate.seconds:.6f}")
+            lines.append(f"market_fetch_duration_seconds_count{{{labels}}} {aggregate.count}")
+        for name, attribute, help in (
+            ('market_fetch_http_requests_total', 'requests', 'HTTP requests made by fetches, including cache hits.'),
+            ('market_fetch_http_bytes_total', 'bytes', 'Response bytes received over the network.'),
+            ('market_fetch_http_retries_total', 'retries', 'HTTP requests retried.'),
+            ('market_fetch_http_cache_hits_total', 'cache_hits', 'Responses served from the HTTP cache.'),
+            ('market_fetch_http_cache_misses_total', 'cache_misses', 'Responses downloaded because the HTTP cache had none or it changed.'),
+        ):
+            metric(name, 'counter', help)
+            for labels, aggregate in aggregates:
+                lines.append(f"{name}{{{labels}}} {getattr(aggregate, attribute)}")
+        return '\n'.join(lines) + '\n'
+
+    def report(self, limit: int = 10) -> str:
+        """The fetchers and symbols that took the most time, as text tables."""
+        summary = self.to_json()
+        if not summary['fetchers']:
+            return "No fetches recorded."
+        header = f"{'fetcher':<28}{'kind':<10}{'operation':<32}{'count':>6}{'errors':>7}{'mean s':>9}{'max s':>9}{'total s':>9}{'KiB':>9}{'retries':>8}{'cached':>8}"
+        lines = [header, '-' * len(header)]
+        for row in summary['fetchers']:
+            errors = row['count'] - row['outcomes'].get('ok', 0)
+            cached = f"{row['cache_hits']}/{row['cache_hits'] + row['cache_misses']}"
+            lines.append(f"{row['fetcher'][:27]:<28}{row['kind'][:9]:<10}{row['operation'][:31]:<32}{row['count']:>6}{errors:>7}{row['mean_seconds']:>9.3f}{row['max_seconds']:>9.3f}{row['seconds']:>9.3f}{row['bytes'] / 1024:>9.1f}{row['retries']:>8}{cached:>8}")
+        lines.append('')
+        lines.append("Slowest symbols:")
+        for row in summary['symbols'][:limit]:
+            lines.append(f"  {row['symbol']:<16}{row['operation']:<32}{row['seconds']:>9.3f} s  {row['count']} fetches, {', '.join(f'{outcome} {count}' for outcome, count in sorted(row['outcomes'].items()))}")
+        return '\n'.join(lines)
+
+    def write(self, file_path: str):
+        """Write the metrics to a file, as JSON if it ends with .json, otherwise in the Prometheus text format."""
+        if file_path.endswith('.json'):
+            summary = self.to_json()
+            atomic_write(file_path, lambda f: json.dump(summary, f, ensure_ascii=False, indent='\t'))
+        else:
+            text = self.to_prometheus()
+            atomic_write(file_path, lambda f: f.write(text))
+
+    @staticmethod
+    def _labels(**labels) -> str:
+        return ','.join(f'{name}="{_escape_label(value)}"' for name, value in labels.items())
+
+def _escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+metrics = FetchMetrics()
@@ -1,31 +1,189 @@
 from playwright.sync_api import sync_playwright
+from contextlib import contextmanager
 import atexit
+import threading
+import weakref
+from market_data.scheduler import on_worker_exit
 
-_playwright = None
-_browser = None
-_page = None
+# Resource types not needed to read data off a page
+BLOCKED_RESOURCE_TYPES = frozenset({'image', 'font', 'stylesheet', 'media'})
+
+# Playwright's sync API is bound to the thread that started it,
+# so every thread (e.g. refresh workers) gets its own browser.
+# The refresh workers are long-lived (see RefreshScheduler) and close theirs when they stop, see close_thread_browser.
+_local = threading.local()
+_instances = []
+_instances_lock = threading.Lock()
+# Pools with idle pages to close with a thread's browser
+_pools = weakref.WeakSet()
 
 def playwright_exit_handler():
-	global _playwright, _browser, _page
 	try:
 		print("Closing Playwright...")
 	except Exception as e:
 		pass
-	try:
-		if _page is not None:
-			_page.close()
-		if _browser is not None:
-			_browser.close()
-		if _playwright is not None:
-			_playwright.stop()
-	except Exception as e:
-		pass
+	with _instances_lock:
+		instances = list(_instances)
+		_instances.clear()
+	for _playwright, _browser in instances:
+		try:
+			if _browser is not None:
+				_browser.close()
+			if _playwright is not None:
+				_playwright.stop()
+		except Exception as e:
+			pass
 
-def get_playwright_page():
-	global _playwright, _browser, _page
-	if _page is None:
+def get_playwright_browser():
+	"""The browser of the current thread, launched on first use."""
+	_browser = getattr(_local, 'browser', None)
+	if _browser is None or not _browser.is_connected():
+		# a disconnected browser still holds its Playwright driver
+		close_thread_browser()
 		_playwright = sync_playwright().start()
 		_browser = _playwright.chromium.launch(channel='chromium')
-		_page = _browser.new_page()
-		atexit.register(playwright_exit_handler)
+		_local.playwright = _playwright
+		_local.browser = _browser
+		with _instances_lock:
+			if not _instances:
+				atexit.register(playwright_exit_handler)
+			_instances.append((_playwright, _browser))
+	return _browser
+
+@on_worker_exit
+def close_thread_browser():
+	"""Close the pages, browser and Playwright driver of the current thread, if it started one."""
+	for pool in list(_pools):
+		pool.close()
+	_page = getattr(_local, 'page', None)
+	_browser = getattr(_local, 'browser', None)
+	_playwright = getattr(_local, 'playwright', None)
+	_local.page = _local.browser = _local.playwright = None
+	if _playwright is None:
+		return
+	with _instances_lock:
+		if (_playwright, _browser) in _instances:
+			_instances.remove((_playwright, _browser))
+	for close in (getattr(_page, 'close', None), getattr(_browser, 'close', None), _playwright.stop):
+		try:
+			if close is not None:
+				close()
+		except Exception:
+			pass
+
+def get_playwright_page():
+	"""A single page of the current thread, kept for fetchers which do not use PagePool."""
+	_page = getattr(_local, 'page', None)
+	if _page is None or _page.is_closed():
+		_page = get_playwright_browser().new_page()
+		_local.page = _page
 	return _page
+
+class PagePool:
+	"""
+	Pool of pages, each in its own isolated browser context, so that fetchers can scrape concurrently.
+
+	At most size pages are checked out at once over all threads, idle pages are kept per thread (see get_playwright_browser)
+	and closed with the thread's browser.
+	A page is health-checked when checked out and recycled with a fresh context after max_navigations navigations.
+	With block_resources, requests for blocked_resource_types are aborted so pages load only what is needed to read data.
+
+	Usage:
+		with page_pool.page() as page:
+			page.goto(url)
+	"""
+
+	def __init__(self, size: int = 4, max_navigations: int = 50, block_resources: bool = False, blocked_resource_types=BLOCKED_RESOURCE_TYPES):
+		self.size = size
+		self.max_navigations = max_navigations
+		self.block_resources = block_resources
+		self.blocked_resource_types = frozenset(blocked_resource_types)
+		self.slots = threading.BoundedSemaphore(size)
+		self.local = threading.local()
+		self.navigations = {}
+		_pools.add(self)
+
+	@contextmanager
+	def page(self, timeout: float | None = None):
+		"""Check out a page for the duration of the with block."""
+		page = self.checkout(timeout)
+		try:
+			yield page
+		finally:
+			self.checkin(page)
+
+	def checkout(self, timeout: float | None = None):
+		"""Take a healthy page of the current thread's browser, waiting up to timeout seconds for a free slot."""
+		if not self.slots.acquire(timeout=timeout):
+			raise TimeoutError(f"No page available in the pool within {timeout} seconds.")
+		try:
+			idle = self._idle_pages()
+			while idle:
+				page = idle.pop()
+				if self.is_healthy(page):
+					return page
+				self._discard(page)
+			return self._new_page()
+		except BaseException:
+			self.slots.release()
+			raise
+
+	def checkin(self, page):
+		"""Return a page to the pool, it is closed instead if it is no longer healthy."""
+		try:
+			if self.is_healthy(page):
+				self._idle_pages().append(page)
+			else:
+				self._discard(page)
+		finally:
+			self.slots.release()
+
+	def is_healthy(self, page) -> bool:
+		if page.is_closed() or self.navigations.get(page, 0) >= self.max_navigations:
+			return False
+		try:
+			page.evaluate('1')
+			return True
+		except Exception:
+			return False
+
+	def close(self):
+		"""Close the idle pages of the current thread."""
+		idle = self._idle_pages()
+		while idle:
+			self._discard(idle.pop())
+
+	def _idle_pages(self) -> list:
+		idle = getattr(self.local, 'idle', None)
+		if idle is None:
+			idle = self.local.idle = []
+		return idle
+
+	def _new_page(self):
+		context = get_playwright_browser().new_context()
+		if self.block_resources:
+			context.route('**/*', self._route)
+		page = context.new_page()
+		self.navigations[page] = 0
+		page.on('framenavigated', lambda frame: self._count_navigation(page, frame))
+		return page
+
+	def _route(self, route):
+		if route.request.resource_type in self.blocked_resource_types:
+			route.abort()
+		else:
+			route.continue_()
+
+	def _count_navigation(self, page, frame):
+		if frame == page.main_frame:
+			self.navigations[page] = self.navigations.get(page, 0) + 1
+
+	def _discard(self, page):
+		self.navigations.pop(page, None)
+		try:
+			page.context.close()
+		except Exception:
+			pass
+
+# Shared pool for fetchers, create a separate PagePool(block_resources=True) for sources that work without images and styles
+page_pool = PagePool()
@@ -0,0 +1,89 @@
+import os
+import threading
+from datetime import date, datetime, timedelta
+import simplejson
+from pytz import timezone
+from utils.atomic_write import atomic_write
+from market_data.fetcher import publish_time_of
+
+class RetrySchedule:
+    """
+    When symbols whose latest value could not be fetched may be tried again, persisted next to the market data.
+
+    A symbol whose data source has not published the value for its latest value date yet (DelayedUpdateError)
+    is not retried before the usual publish time of its kind, then with exponential backoff.
+    Other failures are retried with exponential backoff only. An entry is dropped once the symbol is fetched,
+    or when its fetcher's latest value date moves on, since the symbol is then due for the new date anyway.
+    """
+
+    delay_backoff = timedelta(minutes=15)
+    failure_backoff = timedelta(minutes=1)
+    max_backoff = timedelta(hours=4)
+
+    def __init__(self, file_path: str, logger):
+        self.file_path = file_path
+        self.logger = logger
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.entries: dict[str, dict] = {}
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                self.entries = simplejson.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            self.logger.error(f"Error reading retry schedule {self.file_path}: {e}")
+
+    def is_due(self, symbol: str, latest_value_date: date) -> bool:
+        """Whether a symbol may be fetched now for its latest value date."""
+        entry = self.entries.get(symbol)
+        if entry is None:
+            return True
+        if entry['value_date'] != latest_value_date.isoformat():
+            self.clear(symbol)
+            return True
+        return datetime.now().astimezone() >= datetime.fromisoformat(entry['retry_at'])
+
+    def record_delay(self, symbol: str, kind: str, latest_value_date: date, reason: str) -> datetime:
+        """Schedule the retry of a symbol whose latest value is not published yet, returns when it is due."""
+        return self._record(symbol, latest_value_date, reason, self.delay_backoff, self.publish_time(kind, latest_value_date))
+
+    def record_failure(self, symbol: str, latest_value_date: date, reason: str) -> datetime:
+        """Schedule the retry of a symbol whose fetch failed, returns when it is due."""
+        return self._record(symbol, latest_value_date, reason, self.failure_backoff)
+
+    def clear(self, symbol: str):
+        with self.lock:
+            if self.entries.pop(symbol, None) is not None:
+                self.dirty = True
+
+    def publish_time(self, kind: str, value_date: date) -> datetime:
+        """When the value dated value_date is usually published, see market_data.fetcher.PUBLISH_TIMES."""
+        zone, at = publish_time_of(kind)
+        naive = datetime.combine(value_date, at)
+        return timezone(zone).localize(naive) if zone is not None else naive.astimezone()
+
+    def _record(self, symbol: str, latest_value_date: date, reason: str, backoff: timedelta, not_before: datetime | None = None) -> datetime:
+        with self.lock:
+            entry = self.entries.get(symbol)
+            if entry is None or entry['value_date'] != latest_value_date.isoformat():
+                entry = {'value_date': latest_value_date.isoformat(), 'attempts': 0}
+            attempts = entry['attempts'] + 1
+            retry_at = datetime.now().astimezone() + min(backoff * 2 ** (attempts - 1), self.max_backoff)
+            if not_before is not None and retry_at < not_before:
+                retry_at = not_before
+            self.entries[symbol] = {**entry, 'attempts': attempts, 'retry_at': retry_at.isoformat(timespec='seconds'), 'reason': reason}
+            self.dirty = True
+            return retry_at
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            entries = dict(self.entries)
+            self.dirty = False
+        try:
+            if entries or os.path.exists(self.file_path):
+                atomic_write(self.file_path, lambda f: simplejson.dump(entries, f, ensure_ascii=False, indent='\t'))
+        except OSError as e:
+            self.logger.error(f"Error writing retry schedule {self.file_path}: {e}")
@@ -0,0 +1,235 @@
+import asyncio
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Executor, Future
+
+# Called on every worker thread of a WorkerPool before it exits, to release thread-local resources such as browsers
+worker_exit_hooks = []
+
+def on_worker_exit(hook):
+    """Register hook() to run on each worker thread when its pool shuts down."""
+    worker_exit_hooks.append(hook)
+    return hook
+
+class RefreshCancelled(Exception):
+    """Raised by the result of a job that was cancelled before it finished."""
+
+class RefreshJob:
+    def __init__(self, key, call, host: str, kind: str, is_async: bool = False):
+        """
+        A unit of work for RefreshScheduler.
+        call takes no argument, it is a coroutine function if is_async is set, otherwise a blocking function run in the executor.
+        """
+        self.key = key
+        self.call = call
+        self.host = host
+        self.kind = kind
+        self.is_async = is_async
+
+class WorkerPool(Executor):
+    """
+    A fixed set of worker threads for blocking fetchers, reused by every run of a RefreshScheduler.
+
+    Unlike ThreadPoolExecutor, each worker runs the worker_exit_hooks on its own thread when the pool shuts down,
+    so resources bound to a thread (Playwright's sync API) are released by the thread that created them.
+    A worker stuck in a call can be retired, a new worker takes its place and it exits once the call returns.
+    """
+
+    def __init__(self, workers: int, name: str = 'refresh'):
+        self.name = name
+        self.queue = queue.SimpleQueue()
+        self.shut_down = False
+        self.lock = threading.Lock()
+        self.started = 0
+        self.threads: list[threading.Thread] = []
+        self.retired: set[threading.Thread] = set()
+        for _ in range(workers):
+            self._start_worker()
+
+    def _start_worker(self):
+        thread = threading.Thread(target=self._work, name=f'{self.name}_{self.started}', daemon=True)
+        self.started += 1
+        self.threads.append(thread)
+        thread.start()
+
+    def retire(self, thread: threading.Thread):
+        """Replace a worker whose call is taking too long, it stops taking calls and exits after the current one."""
+        with self.lock:
+            if self.shut_down or thread not in self.threads:
+                return
+            self.threads.remove(thread)
+            self.retired.add(thread)
+            self._start_worker()
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        with self.lock:
+            if self.shut_down:
+                raise RuntimeError("Cannot submit to a worker pool after shutdown.")
+            future = Future()
+            self.queue.put((future, fn, args, kwargs))
+            return future
+
+    def _work(self):
+        try:
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    if threading.current_thread() in self.retired:
+                        # the sentinel is meant for one of the workers which took this one's place
+                        self.queue.put(None)
+                    return
+                future, fn, args, kwargs = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+                if threading.current_thread() in self.retired:
+                    return
+        finally:
+            for hook in worker_exit_hooks:
+                try:
+                    hook()
+                except Exception:
+                    pass
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False, timeout: float | None = None):
+        """Stop the workers, wait=True waits for them at most timeout seconds in total (without limit if None)."""
+        with self.lock:
+            if self.shut_down:
+                return
+            self.shut_down = True
+        if cancel_futures:
+            while True:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                item[0].cancel()
+        # the workers stop after the calls queued before them
+        for _ in self.threads:
+            self.queue.put(None)
+        if wait:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            for thread in [*self.threads, *self.retired]:
+                thread.join(None if deadline is None else max(0, deadline - time.monotonic()))
+
+class RefreshScheduler:
+    """
+    Runs refresh jobs on an asyncio event loop: coroutines natively and blocking fetchers on a thread pool,
+    with at most max_concurrency jobs in flight overall, per_host per data source host and per_kind[kind] per fetcher kind.
+    Each job is limited to timeout seconds from when it starts, and setting the cancel event stops every job not finished yet.
+    Blocking fetchers run on one WorkerPool for the scheduler's lifetime, close() (or the process exit) shuts it down.
+    A blocking fetch cannot be interrupted, its worker is retired on timeout or cancellation so that it does not hold up later jobs.
+    """
+
+    # Seconds close() waits for the workers, the blocking fetches still running are abandoned after it
+    close_timeout = 5
+
+    def __init__(self, max_concurrency: int = 8, per_host: int = 2, per_kind: dict[str, int] | None = None, timeout: float | None = 60):
+        self.max_concurrency = max_concurrency
+        self.per_host = per_host
+        self.per_kind = per_kind or {'default': max_concurrency}
+        self.timeout = timeout
+        self.pool: WorkerPool | None = None
+        self.pool_lock = threading.Lock()
+
+    def worker_pool(self) -> WorkerPool:
+        with self.pool_lock:
+            if self.pool is None:
+                self.pool = WorkerPool(self.max_concurrency)
+                atexit.register(self.close)
+            return self.pool
+
+    def close(self):
+        """Stop the worker threads, waiting up to close_timeout for the blocking fetches still running, and release their resources."""
+        with self.pool_lock:
+            pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True, timeout=self.close_timeout)
+
+    def run(self, jobs: list[RefreshJob], cancel: threading.Event | None = None, progress=None) -> dict:
+        """
+        Run jobs to completion from synchronous code.
+        Returns {key: result} where result() returns the job's value or raises its exception
+        (TimeoutError on timeout, RefreshCancelled on cancellation).
+        progress(done, total) is called whenever a job finishes, on the thread running the jobs.
+        """
+        if not jobs:
+            return {}
+        return asyncio.run(self.run_async(jobs, cancel, progress))
+
+    async def run_async(self, jobs: list[RefreshJob], cancel: threading.Event | None = None, progress=None) -> dict:
+        loop = asyncio.get_running_loop()
+        executor = self.worker_pool() if not all(job.is_async for job in jobs) else None
+        overall = asyncio.Semaphore(self.max_concurrency)
+        host_limits = {job.host: asyncio.Semaphore(self.per_host) for job in jobs}
+        kind_limits = {job.kind: asyncio.Semaphore(self.per_kind.get(job.kind, self.per_kind['default'])) for job in jobs}
+
+        async def run_job(job: RefreshJob):
+            # take the narrowest limits first so that waiting jobs do not hold an overall slot
+            async with kind_limits[job.kind], host_limits[job.host], overall:
+                if job.is_async:
+                    return await self._limit(job.call())
+                return await self._run_blocking(loop, executor, job)
+
+        tasks = {job.key: asyncio.create_task(run_job(job)) for job in jobs}
+        if progress is not None:
+            done = []
+            def on_done(task):
+                done.append(task)
+                progress(len(done), len(tasks))
+            for task in tasks.values():
+                task.add_done_callback(on_done)
+        watcher = asyncio.create_task(self._watch(cancel, tasks.values())) if cancel is not None else None
+        try:
+            await asyncio.wait(tasks.values())
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+        return {key: self._result(task) for key, task in tasks.items()}
+
+    async def _limit(self, awaitable):
+        try:
+            return await asyncio.wait_for(awaitable, self.timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Timed out after {self.timeout} seconds.") from None
+
+    async def _run_blocking(self, loop, executor: WorkerPool, job: RefreshJob):
+        """Run a blocking job on the pool, its timeout counts from when a worker picks it up."""
+        started = asyncio.Event()
+        worker = None
+
+        def call():
+            nonlocal worker
+            worker = threading.current_thread()
+            loop.call_soon_threadsafe(started.set)
+            return job.call()
+
+        future = executor.submit(call)
+        try:
+            await started.wait()
+            return await self._limit(asyncio.wrap_future(future))
+        except (TimeoutError, asyncio.CancelledError):
+            future.cancel()
+            if worker is not None and not future.done():
+                # the call keeps running, let another worker take its place
+                executor.retire(worker)
+            raise
+
+    async def _watch(self, cancel: threading.Event, tasks):
+        while not cancel.is_set():
+            await asyncio.sleep(0.1)
+        for task in tasks:
+            task.cancel()
+
+    @staticmethod
+    def _result(task: asyncio.Task):
+        def result():
+            if task.cancelled():
+                raise RefreshCancelled("Refresh cancelled.")
+            return task.result()
+        return result
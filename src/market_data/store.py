@@ -0,0 +1,201 @@
+from decimal import Decimal
+import os
+import json
+import sqlite3
+import simplejson
+from utils.atomic_write import atomic_write
+from utils.history import History
+
+HOLDING_KEYS = ('update_at', 'value', 'kind', 'composition')
+# Parts of a holding which are saved separately: the fetched value (kind, value, update_at),
+# and the composition with the keys of the holding outside HOLDING_KEYS (like its pending_composition)
+HOLDING_PARTS = frozenset({'value', 'composition'})
+
+class JsonMarketStore:
+    """The whole market data as one JSON document, rewritten on every save."""
+
+    def __init__(self, file_path, logger):
+        self.logger = logger
+        self.file_path = file_path
+        self.history = History()
+        self.history_saved = False
+
+    def exists(self) -> bool:
+        return os.path.exists(self.file_path)
+
+    def load(self) -> dict:
+        with open(self.file_path, 'r', encoding='utf-8') as f:
+            return json.load(f, parse_float=Decimal)
+
+    def save(self, data: dict, symbols: dict[str, set[str]], currencies):
+        if not self.history_saved:
+            # keep the version this process started from
+            self.history.snapshot(self.file_path)
+            self.history_saved = True
+        # store back to file_path
+        atomic_write(self.file_path, lambda f: simplejson.dump(data, f, ensure_ascii=False, indent='\t'))
+
+    def close(self):
+        pass
+
+class SqliteMarketStore:
+    """
+    Market data in a SQLite database (WAL mode), one row per symbol, composition entry and exchange rate,
+    so saving a refreshed symbol only touches its own rows and several processes can share the file.
+    Only the changed parts of a holding are written, and not over a newer version another process wrote since,
+    Market.reload picks those up.
+    The JSON document stays the import/export format, see import_json and Market.export_json.
+    """
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS holdings (
+            symbol TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            value TEXT NOT NULL,
+            update_at TEXT NOT NULL,
+            composition_update_at TEXT NOT NULL,
+            extra TEXT
+        );
+        CREATE INDEX IF NOT EXISTS holdings_update_at ON holdings (update_at);
+        CREATE TABLE IF NOT EXISTS compositions (
+            symbol TEXT NOT NULL,
+            asset TEXT NOT NULL,
+            weight TEXT NOT NULL,
+            PRIMARY KEY (symbol, asset)
+        );
+        CREATE TABLE IF NOT EXISTS exchange_rates (
+            currency TEXT PRIMARY KEY,
+            symbol TEXT NOT NULL,
+            rate TEXT NOT NULL,
+            update_at TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS exchange_rates_update_at ON exchange_rates (update_at);
+    '''
+
+    def __init__(self, file_path, logger):
+        self.logger = logger
+        self.file_path = file_path
+        # the connection is shared by the GUI thread and refresh workers, Market.lock serializes its use
+        self.connection = sqlite3.connect(file_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(self.SCHEMA)
+
+        # seed a new database from the JSON file next to it
+        seed_path = os.path.splitext(file_path)[0] + '.json'
+        if self.is_empty() and os.path.exists(seed_path):
+            self.logger.info(f"Importing market data from {seed_path} into {file_path}.")
+            self.import_json(seed_path)
+
+    def exists(self) -> bool:
+        return True
+
+    def is_empty(self) -> bool:
+        return self.connection.execute('SELECT NOT EXISTS (SELECT 1 FROM holdings) AND NOT EXISTS (SELECT 1 FROM exchange_rates)').fetchone()[0] == 1
+
+    def load(self) -> dict:
+        holdings = {}
+        for symbol, kind, value, update_at, composition_update_at, extra in self.connection.execute(
+                'SELECT symbol, kind, value, update_at, composition_update_at, extra FROM holdings ORDER BY rowid'):
+            holdings[symbol] = {
+                'update_at': update_at,
+                'value': _loads(value),
+                'kind': kind,
+                'composition': {'update_at': composition_update_at},
+                **(_loads(extra) if extra else {}),
+            }
+        for symbol, asset, weight in self.connection.execute('SELECT symbol, asset, weight FROM compositions ORDER BY rowid'):
+            if symbol in holdings:
+                holdings[symbol]['composition'][asset] = _loads(weight)
+        exchange_rate = {}
+        for currency, symbol, rate, update_at in self.connection.execute(
+                'SELECT currency, symbol, rate, update_at FROM exchange_rates ORDER BY rowid'):
+            exchange_rate[currency] = {'symbol': symbol, 'rate': _loads(rate), 'update_at': update_at}
+        return {'holdings': holdings, 'exchange_rate': exchange_rate}
+
+    def save(self, data: dict, symbols: dict[str, set[str]], currencies):
+        """Write the given HOLDING_PARTS of the symbols ({symbol: parts}) and the exchange rates of the currencies."""
+        with self.connection:
+            self.connection.execute('BEGIN IMMEDIATE')
+            for symbol, parts in symbols.items():
+                self._update_holding(symbol, data['holdings'][symbol], parts)
+            for currency in currencies:
+                self._upsert_exchange_rate(currency, data['exchange_rate'][currency])
+
+    def _update_holding(self, symbol: str, info: dict, parts: set[str]):
+        """
+        Write parts of a holding inside the save transaction. A part whose date in the database is later than ours
+        was written by another process since we loaded it, and is kept.
+        """
+        row = self.connection.execute('SELECT update_at, composition_update_at FROM holdings WHERE symbol = ?', (symbol,)).fetchone()
+        if row is None:
+            self._upsert_holding(symbol, info)
+            return
+        update_at, composition_update_at = row
+        if 'value' in parts:
+            if update_at > info['update_at']:
+                self.logger.info(f"Keeping the newer value of {symbol} from {update_at} in {self.file_path}.")
+            else:
+                self.connection.execute(
+                    'UPDATE holdings SET kind = ?, value = ?, update_at = ? WHERE symbol = ?',
+                    (info['kind'], _dumps(info['value']), info['update_at'], symbol))
+        if 'composition' in parts:
+            if composition_update_at > info['composition']['update_at']:
+                self.logger.info(f"Keeping the newer composition of {symbol} from {composition_update_at} in {self.file_path}.")
+            else:
+                extra = {key: value for key, value in info.items() if key not in HOLDING_KEYS}
+                self.connection.execute(
+                    'UPDATE holdings SET composition_update_at = ?, extra = ? WHERE symbol = ?',
+                    (info['composition']['update_at'], _dumps(extra) if extra else None, symbol))
+                self._replace_composition(symbol, info['composition'])
+
+    def _upsert_holding(self, symbol: str, info: dict):
+        extra = {key: value for key, value in info.items() if key not in HOLDING_KEYS}
+        composition = info['composition']
+        self.connection.execute(
+            'INSERT INTO holdings (symbol, kind, value, update_at, composition_update_at, extra) VALUES (?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (symbol) DO UPDATE SET kind = excluded.kind, value = excluded.value, update_at = excluded.update_at, '
+            'composition_update_at = excluded.composition_update_at, extra = excluded.extra',
+            (symbol, info['kind'], _dumps(info['value']), info['update_at'], composition['update_at'], _dumps(extra) if extra else None))
+        self._replace_composition(symbol, composition)
+
+    def _replace_composition(self, symbol: str, composition: dict):
+        self.connection.execute('DELETE FROM compositions WHERE symbol = ?', (symbol,))
+        self.connection.executemany(
+            'INSERT INTO compositions (symbol, asset, weight) VALUES (?, ?, ?)',
+            [(symbol, asset, _dumps(weight)) for asset, weight in composition.items() if asset != 'update_at'])
+
+    def _upsert_exchange_rate(self, currency: str, info: dict):
+        self.connection.execute(
+            'INSERT INTO exchange_rates (currency, symbol, rate, update_at) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (currency) DO UPDATE SET symbol = excluded.symbol, rate = excluded.rate, update_at = excluded.update_at',
+            (currency, info['symbol'], _dumps(info['rate']), info['update_at']))
+
+    def import_json(self, json_path):
+        """Replace the content of the database with a market data JSON file."""
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f, parse_float=Decimal)
+        with self.connection:
+            self.connection.execute('BEGIN IMMEDIATE')
+            self.connection.execute('DELETE FROM compositions')
+            self.connection.execute('DELETE FROM holdings')
+            self.connection.execute('DELETE FROM exchange_rates')
+            for symbol, info in data['holdings'].items():
+                self._upsert_holding(symbol, info)
+            for currency, info in data.get('exchange_rate', {}).items():
+                self._upsert_exchange_rate(currency, info)
+
+    def close(self):
+        self.connection.close()
+
+def _dumps(value) -> str:
+    return simplejson.dumps(value, ensure_ascii=False)
+
+def _loads(text: str):
+    return json.loads(text, parse_float=Decimal)
+
+def open_market_store(file_path, logger):
+    """Pick the storage backend of a market data file by its extension."""
+    if os.path.splitext(file_path)[1].lower() in ('.db', '.sqlite', '.sqlite3'):
+        return SqliteMarketStore(file_path, logger)
+    return JsonMarketStore(file_path, logger)
@@ -0,0 +1,111 @@
+from decimal import Decimal
+from typing import Mapping
+
+def import_numpy():
+	"""NumPy, or None if it is not installed. Only imported by the modes using it, it slows down the start of the command line."""
+	try:
+		import numpy
+	except ImportError:
+		return None
+	return numpy
+
+class AllocationEngine:
+	"""
+	Computes allocations as a product of the holdings value vector with a sparse holdings x assets weight matrix,
+	followed by an assets x groups projection for merged assets.
+
+	The matrix is kept until the composition rows of the holdings change (Market.get_composition returns the same
+	object for a symbol until it is invalidated), so a refresh only rebuilds the value vector.
+
+	mode is one of:
+	- 'decimal': exact Decimal arithmetic, same results as summing holding by holding
+	- 'numpy': float64 arithmetic with NumPy, converted back to Decimal
+	- 'verify': computes both and raises AssertionError if they differ by more than tolerance (relative)
+	"""
+
+	MODES = ('decimal', 'numpy', 'verify')
+
+	def __init__(self, mode: str = 'decimal', tolerance: Decimal = Decimal('1e-9')):
+		if mode not in self.MODES:
+			raise ValueError(f"Unknown allocation mode: {mode}")
+		self.np = import_numpy() if mode != 'decimal' else None
+		if mode != 'decimal' and self.np is None:
+			raise ValueError(f"Allocation mode {mode} requires numpy.")
+		self.mode = mode
+		self.tolerance = tolerance
+		self.compositions = None
+		self.merge = None
+
+	def allocate(self, values: list[Decimal], compositions: list[Mapping[str, Decimal]], merge: dict[str, str] | None = None) -> dict[str, Decimal]:
+		"""Allocation per asset (or per merged group) of holdings with the given values and compositions."""
+		if self.compositions is None or len(self.compositions) != len(compositions) or any(a is not b for a, b in zip(self.compositions, compositions)):
+			self._build_matrix(compositions)
+			self.merge = None
+		merge = merge or {}
+		if self.merge != list(merge.items()):
+			self._build_projection(merge)
+
+		if self.mode == 'decimal':
+			return self._allocate_decimal(values)
+		if self.mode == 'numpy':
+			return self._allocate_numpy(values)
+		exact = self._allocate_decimal(values)
+		approximate = self._allocate_numpy(values)
+		for group, value in exact.items():
+			if abs(value - approximate[group]) > self.tolerance * max(1, abs(value)):
+				raise AssertionError(f"Allocation of {group} differs: {value} (decimal) vs {approximate[group]} (numpy).")
+		return exact
+
+	def _build_matrix(self, compositions: list[Mapping[str, Decimal]]):
+		asset_index = {}
+		rows, columns, weights = [], [], []
+		for row, composition in enumerate(compositions):
+			for asset, weight in composition.items():
+				rows.append(row)
+				columns.append(asset_index.setdefault(asset, len(asset_index)))
+				weights.append(weight)
+		self.compositions = list(compositions)
+		self.assets = list(asset_index)
+		self.rows, self.columns, self.weights = rows, columns, weights
+		if self.np is not None:
+			np = self.np
+			self.np_rows = np.array(rows, dtype=np.intp)
+			self.np_columns = np.array(columns, dtype=np.intp)
+			self.np_weights = np.array([float(weight) for weight in weights], dtype=np.float64)
+
+	def _build_projection(self, merge: dict[str, str]):
+		# merges apply in order, like moving the value of merge_from into merge_to one after another
+		target = {asset: asset for asset in self.assets}
+		groups = list(self.assets)
+		for merge_from, merge_to in merge.items():
+			# merging an asset into itself changes nothing
+			if merge_from == merge_to or merge_from not in groups:
+				continue
+			if merge_to not in groups:
+				groups.append(merge_to)
+			groups.remove(merge_from)
+			for asset, group in target.items():
+				if group == merge_from:
+					target[asset] = merge_to
+		group_index = {group: index for index, group in enumerate(groups)}
+		self.merge = list(merge.items())
+		self.groups = groups
+		self.group_of_asset = [group_index[target[asset]] for asset in self.assets]
+		if self.np is not None:
+			self.np_group_of_asset = self.np.array(self.group_of_asset, dtype=self.np.intp)
+
+	def _allocate_decimal(self, values: list[Decimal]) -> dict[str, Decimal]:
+		asset_values = [0] * len(self.assets)
+		for row, column, weight in zip(self.rows, self.columns, self.weights):
+			asset_values[column] += values[row] * weight
+		group_values = [0] * len(self.groups)
+		for column, value in enumerate(asset_values):
+			group_values[self.group_of_asset[column]] += value
+		return dict(zip(self.groups, group_values))
+
+	def _allocate_numpy(self, values: list[Decimal]) -> dict[str, Decimal]:
+		np = self.np
+		np_values = np.array([float(value) for value in values], dtype=np.float64)
+		asset_values = np.bincount(self.np_columns, weights=np_values[self.np_rows] * self.np_weights, minlength=len(self.assets))
+		group_values = np.bincount(self.np_group_of_asset, weights=asset_values, minlength=len(self.groups))
+		return {group: Decimal(repr(float(value))) for group, value in zip(self.groups, group_values)}
@@ -16,3 +16,8 @@ class Holding:
 		"""Update the share of the holding."""
 		self.share = new_share
 		self.value = self.share * self.price
+
+	def update_price(self, new_price: int | Decimal):
+		"""Update the price of the holding."""
+		self.price = new_price
+		self.value = self.share * self.price
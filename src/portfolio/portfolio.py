@@ -1,16 +1,20 @@
 from datetime import datetime
 import os
+import threading
 import json
 import simplejson
 from portfolio.holding import Holding
+from portfolio.allocation import AllocationEngine
 from market_data.market import Market
+from utils.atomic_write import atomic_write
+from utils.history import History
 from decimal import Decimal
-import shutil
 
 class Portfolio:
 	def __init__(self, portfolio_file, market_data_path, logger):
 		self.logger = logger
 		self.portfolio_file = portfolio_file
+		self.history = History()
 		if not os.path.exists(portfolio_file):
 			self.logger.error(f"Portfolio file not found: {portfolio_file}")
 			return
@@ -19,10 +23,13 @@ class Portfolio:
 
 		with open(portfolio_file, 'r', encoding='utf-8') as f:
 			self.portfolio_data = json.load(f, parse_float=Decimal)
+		self.market.prefetch(holding['symbol'] for holding in self.portfolio_data['holdings'])
 		self.holdings = [Holding(market=self.market, **holding) for holding in self.portfolio_data['holdings']]
 		self.holdings_map = {holding.symbol: holding for holding in self.holdings}
+		self.market.flush()
 
 		self.total_value = sum(holding.value for holding in self.holdings)
+		self.allocation_engine = AllocationEngine(self.portfolio_data.get('allocation_mode', 'decimal'))
 
 	def get_holding(self, symbol: str) -> Holding | None:
 		return self.holdings_map.get(symbol, None)
@@ -53,43 +60,38 @@ class Portfolio:
 		self.save_portfolio()
 		return True
 
-	def toggle_market_price_mode(self):
+	def toggle_market_price_mode(self, cancel: threading.Event | None = None, progress=None):
+		"""Switch market price mode, a cancelled quote prefetch switches it back instead of fetching the missing quotes one by one."""
 		self.market.market_price_mode = not self.market.market_price_mode
-		self.holdings = [Holding(market=self.market, **holding) for holding in self.portfolio_data['holdings']]
-		self.holdings_map = {holding.symbol: holding for holding in self.holdings}
+		if self.market.market_price_mode:
+			self.market.prefetch_quotes((holding.symbol for holding in self.holdings), cancel, progress)
+			if cancel is not None and cancel.is_set():
+				self.market.market_price_mode = False
+				return
+		self.reprice()
+
+	def prefetch(self, cancel: threading.Event | None = None, progress=None):
+		"""Fetch the expired market data of the holdings concurrently, see Market.prefetch."""
+		self.market.prefetch((holding.symbol for holding in self.holdings), cancel, progress)
+
+	def reprice(self):
+		"""Update the price of every holding in place from the market."""
+		for holding in self.holdings:
+			holding.update_price(self.market.get_price(holding.symbol))
+		self.market.flush()
 		self.total_value = sum(holding.value for holding in self.holdings)
 
 	def current_allocation(self, merge: bool = False) -> dict[str, Decimal]:
-		allocation = {}
-		for holding in self.holdings:
-			for asset, pct in self.market.get_composition(holding.symbol).items():
-				if asset not in allocation:
-					allocation[asset] = 0
-				allocation[asset] += holding.value * pct
-		if merge:
-			for merge_from, merge_to in self.portfolio_data['merge'].items():
-				if merge_from in allocation:
-					if merge_to not in allocation:
-						allocation[merge_to] = 0
-					allocation[merge_to] += allocation[merge_from]
-					del allocation[merge_from]
-		return allocation
+		compositions = [self.market.get_composition(holding.symbol) for holding in self.holdings]
+		values = [holding.value for holding in self.holdings]
+		return self.allocation_engine.allocate(values, compositions, self.portfolio_data['merge'] if merge else None)
 
 	def save_portfolio(self):
-		"""Save portfolio data to the portfolio file and create a history backup."""
-		# Create history directory if it doesn't exist
-		if not os.path.exists('.history'):
-			os.makedirs('.history')
-
-		# Save a copy to history with timestamp in filename
-		history_file_path = os.path.join('.history', f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.path.basename(self.portfolio_file)}")
-
-		# Copy the portfolio file to history
-		shutil.copyfile(self.portfolio_file, history_file_path)
+		"""Save portfolio data to the portfolio file and record the previous version in history."""
+		self.history.snapshot(self.portfolio_file)
 
 		# Save current portfolio data
-		with open(self.portfolio_file, 'w', encoding='utf-8') as f:
-			simplejson.dump(self.portfolio_data, f, ensure_ascii=False, indent='\t')
+		atomic_write(self.portfolio_file, lambda f: simplejson.dump(self.portfolio_data, f, ensure_ascii=False, indent='\t'))
 		self.logger.info("Portfolio updated successfully.")
 
 	def get_target_percentage_configurations(self) -> list[str]:
@@ -1,8 +1,9 @@
 from abc import ABC, abstractmethod
 from portfolio.portfolio import Portfolio
 from decimal import Decimal
-import importlib
-from os import path
+import importlib.util
+import os
+import threading
 
 class Calculator(ABC):
 
@@ -13,11 +14,63 @@ class Calculator(ABC):
 	def calculate_adjustments(self, duration) -> dict[str, (Decimal, Decimal)]:
 		pass
 
+class CalculatorRegistry:
+	"""
+	The calculator classes of the calculator.*.py plugins by method name.
+
+	A plugin is imported on first use of its method and kept, it is only imported again when its file's mtime or size
+	changes, so creating a calculator costs a stat of the file. The methods are listed again when the directory changes.
+	"""
+
+	def __init__(self, directory: str):
+		self.directory = directory
+		# method -> (mtime, size, calculator class)
+		self.classes: dict[str, tuple[int, int, type]] = {}
+		self.methods: list[str] = []
+		self.methods_mtime = None
+		self.lock = threading.Lock()
+
+	def available_methods(self) -> list[str]:
+		"""Names of the calculator.*.py plugins, sorted."""
+		mtime = os.stat(self.directory).st_mtime_ns
+		with self.lock:
+			if mtime != self.methods_mtime:
+				self.methods = sorted(
+					file_name[len('calculator.'):-len('.py')] for file_name in os.listdir(self.directory)
+					if file_name.startswith('calculator.') and file_name.endswith('.py') and file_name != 'calculator.py'
+				)
+				self.methods_mtime = mtime
+			return self.methods
+
+	def get(self, method: str) -> type:
+		"""The calculator class of a method, imported if it is new or its file changed."""
+		calculator_path = os.path.join(self.directory, f'calculator.{method}.py')
+		try:
+			stat = os.stat(calculator_path)
+		except FileNotFoundError:
+			raise ValueError(f"Unknown calculator method {method}, available: {', '.join(self.available_methods())}") from None
+		with self.lock:
+			cached = self.classes.get(method)
+			if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+				return cached[2]
+			spec = importlib.util.spec_from_file_location(f"calculator.{method}", calculator_path)
+			module = importlib.util.module_from_spec(spec)
+			spec.loader.exec_module(module)
+			self.classes[method] = (stat.st_mtime_ns, stat.st_size, module.StandardCalculator)
+			return module.StandardCalculator
+
+calculators = CalculatorRegistry(os.path.dirname(os.path.abspath(__file__)))
+
+def available_methods() -> list[str]:
+	return calculators.available_methods()
+
 def CreateCalculator(portfolio: Portfolio, method: str, *args, **kwargs):
 	"""Factory function to create a calculator instance based on the specified method."""
-	calculator_path = path.join(path.dirname(__file__), f'calculator.{method}.py')
-	spec = importlib.util.spec_from_file_location(f"calculator.{method}", calculator_path)
-	module = importlib.util.module_from_spec(spec)
-	spec.loader.exec_module(module)
-	StandardCalculator = module.StandardCalculator
+	StandardCalculator = calculators.get(method)
 	return StandardCalculator(portfolio, *args, **kwargs)
+
+def adjustment_action(asset: str, amount) -> str:
+	"""Label of an adjustment, shared by the reports of the GUI and the command line."""
+	if asset == 'cash':
+		return "Save" if amount > 0 else "Spend" if amount < 0 else "No Change"
+	return "Buy" if amount > 0 else "Sell" if amount < 0 else "No Change"
@@ -0,0 +1,27 @@
+import os
+import shutil
+import tempfile
+
+def atomic_write(file_path, write, encoding='utf-8'):
+	"""
+	Write a file through a temporary file in the same directory and rename it over file_path,
+	so readers never observe a partially written file.
+	write is called with the opened temporary file, which is opened in binary mode if encoding is None.
+	"""
+	directory = os.path.dirname(os.path.abspath(file_path))
+	fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(file_path)}.", suffix='.tmp', dir=directory)
+	try:
+		with os.fdopen(fd, 'w' if encoding is not None else 'wb', encoding=encoding) as f:
+			write(f)
+			f.flush()
+			os.fsync(f.fileno())
+		if os.path.exists(file_path):
+			# mkstemp creates the file owner-only, keep the permissions of the file being replaced
+			shutil.copymode(file_path, temp_path)
+		os.replace(temp_path, file_path)
+	except BaseException:
+		try:
+			os.remove(temp_path)
+		except OSError:
+			pass
+		raise
@@ -0,0 +1,223 @@
+from datetime import datetime, date
+import os
+import re
+import gzip
+import json
+import hashlib
+import threading
+from utils.atomic_write import atomic_write
+
+class RetentionPolicy:
+	"""
+	Which snapshots of a file survive compaction: the newest keep_last ones,
+	plus the newest snapshot of each of the last keep_daily days, keep_weekly weeks, keep_monthly months and keep_yearly years.
+	None keeps every bucket.
+	"""
+
+	def __init__(self, keep_last: int = 20, keep_daily: int = 30, keep_weekly: int = 26, keep_monthly: int = 24, keep_yearly: int | None = None):
+		self.keep_last = keep_last
+		self.keep_daily = keep_daily
+		self.keep_weekly = keep_weekly
+		self.keep_monthly = keep_monthly
+		self.keep_yearly = keep_yearly
+
+	def select(self, snapshots: list[dict]) -> set[int]:
+		"""Return the positions in snapshots of the snapshots to keep, snapshots are of a single file in index order."""
+		# newest first, snapshots taken within the same second stay in index order
+		order = sorted(range(len(snapshots)), key=lambda i: snapshots[i]['time'])[::-1]
+		keep = set(order[:self.keep_last])
+		buckets = [
+			(self.keep_daily, lambda t: t.date()),
+			(self.keep_weekly, lambda t: t.isocalendar()[:2]),
+			(self.keep_monthly, lambda t: (t.year, t.month)),
+			(self.keep_yearly, lambda t: t.year),
+		]
+		for limit, bucket_of in buckets:
+			seen = set()
+			for i in order:
+				bucket = bucket_of(datetime.fromisoformat(snapshots[i]['time']))
+				if bucket in seen:
+					continue
+				if limit is not None and len(seen) >= limit:
+					break
+				seen.add(bucket)
+				keep.add(i)
+		return keep
+
+class History:
+	"""
+	Content-addressed history of data files.
+	Every snapshot is an entry of index.jsonl pointing at a gzip compressed object named by the SHA-256 of the content,
+	so identical versions are stored once and saving an unchanged file records nothing.
+	Old snapshots are thinned out by the retention policy at most once a day.
+	"""
+
+	INDEX = 'index.jsonl'
+	OBJECTS = 'objects'
+	COMPACTED = 'compacted_at'
+
+	def __init__(self, directory: str = '.history', policy: RetentionPolicy | None = None):
+		self.directory = directory
+		self.policy = policy or RetentionPolicy()
+		self.lock = threading.Lock()
+
+	def _object_path(self, digest: str) -> str:
+		return os.path.join(self.directory, self.OBJECTS, digest[:2], f"{digest}.gz")
+
+	@staticmethod
+	def _unique_id(snapshot_id: str, snapshots: list[dict]) -> str:
+		"""snapshot_id, with a sequence number if a snapshot already has it (the same content saved twice within its timestamp)."""
+		ids = {snapshot['id'] for snapshot in snapshots}
+		unique_id = snapshot_id
+		sequence = 1
+		while unique_id in ids:
+			unique_id = f"{snapshot_id}_{sequence}"
+			sequence += 1
+		return unique_id
+
+	def _read_index(self) -> list[dict]:
+		index_path = os.path.join(self.directory, self.INDEX)
+		if not os.path.exists(index_path):
+			return []
+		with open(index_path, 'r', encoding='utf-8') as f:
+			return [json.loads(line) for line in f if line.strip()]
+
+	def snapshot(self, file_path: str) -> dict | None:
+		"""
+		Record the current content of file_path.
+		Returns the new snapshot, or None if the file is missing or unchanged since its latest snapshot.
+		"""
+		if not os.path.exists(file_path):
+			return None
+		with open(file_path, 'rb') as f:
+			content = f.read()
+		digest = hashlib.sha256(content).hexdigest()
+		name = os.path.basename(file_path)
+
+		with self.lock:
+			os.makedirs(self.directory, exist_ok=True)
+			index = self._read_index()
+			snapshots = [snapshot for snapshot in index if snapshot['name'] == name]
+			if snapshots and snapshots[-1]['hash'] == digest:
+				return None
+
+			object_path = self._object_path(digest)
+			if not os.path.exists(object_path):
+				os.makedirs(os.path.dirname(object_path), exist_ok=True)
+				temp_path = f"{object_path}.tmp"
+				with open(temp_path, 'wb') as f:
+					f.write(gzip.compress(content))
+				os.replace(temp_path, object_path)
+
+			now = datetime.now()
+			snapshot = {
+				'id': self._unique_id(f"{now.strftime('%Y%m%d_%H%M%S_%f')}_{digest[:12]}", index),
+				'name': name,
+				'time': now.isoformat(timespec='seconds'),
+				'hash': digest,
+				'size': len(content),
+			}
+			with open(os.path.join(self.directory, self.INDEX), 'a', encoding='utf-8') as f:
+				f.write(json.dumps(snapshot, ensure_ascii=False) + '\n')
+
+			self._compact_daily()
+		return snapshot
+
+	def snapshots(self, name: str | None = None) -> list[dict]:
+		"""List snapshots, oldest first, optionally only those of the file with the given base name."""
+		with self.lock:
+			snapshots = self._read_index()
+		return [snapshot for snapshot in snapshots if name is None or snapshot['name'] == name]
+
+	def read(self, snapshot_id: str) -> bytes:
+		"""Return the content of a snapshot."""
+		for snapshot in self.snapshots():
+			if snapshot['id'] == snapshot_id:
+				with open(self._object_path(snapshot['hash']), 'rb') as f:
+					return gzip.decompress(f.read())
+		raise KeyError(f"Snapshot {snapshot_id} not found.")
+
+	def restore(self, snapshot_id: str, file_path: str):
+		"""Overwrite file_path with a snapshot, the current content is snapshotted first so the restore can be undone."""
+		content = self.read(snapshot_id)
+		self.snapshot(file_path)
+		atomic_write(file_path, lambda f: f.write(content.decode('utf-8')))
+
+	def _compact_daily(self):
+		compacted_path = os.path.join(self.directory, self.COMPACTED)
+		if os.path.exists(compacted_path) and date.fromtimestamp(os.path.getmtime(compacted_path)) == date.today():
+			return
+		self._compact()
+		with open(compacted_path, 'w', encoding='utf-8') as f:
+			f.write(datetime.now().isoformat(timespec='seconds'))
+
+	def compact(self):
+		"""Drop the snapshots the retention policy does not keep and delete the objects nothing refers to anymore."""
+		with self.lock:
+			self._compact()
+
+	def _compact(self):
+		snapshots = self._read_index()
+		keep = set()
+		for name in {snapshot['name'] for snapshot in snapshots}:
+			# by position, older index files can hold the same id twice
+			positions = [i for i, snapshot in enumerate(snapshots) if snapshot['name'] == name]
+			keep |= {positions[i] for i in self.policy.select([snapshots[position] for position in positions])}
+		kept = [snapshot for i, snapshot in enumerate(snapshots) if i in keep]
+		if len(kept) != len(snapshots):
+			atomic_write(os.path.join(self.directory, self.INDEX), lambda f: f.writelines(json.dumps(snapshot, ensure_ascii=False) + '\n' for snapshot in kept))
+
+		referenced = {snapshot['hash'] for snapshot in kept}
+		objects_dir = os.path.join(self.directory, self.OBJECTS)
+		if not os.path.exists(objects_dir):
+			return
+		for prefix in os.listdir(objects_dir):
+			prefix_dir = os.path.join(objects_dir, prefix)
+			for object_name in os.listdir(prefix_dir):
+				if object_name.endswith('.gz') and object_name[:-3] not in referenced:
+					os.remove(os.path.join(prefix_dir, object_name))
+			if not os.listdir(prefix_dir):
+				os.rmdir(prefix_dir)
+
+	def import_legacy(self, remove: bool = False) -> int:
+		"""
+		Move the plain timestamped copies (YYYYmmdd_HHMMSS_<name>) of earlier versions into the store.
+		The copies are only deleted when remove is set. Returns the number of imported files.
+		"""
+		pattern = re.compile(r'^(\d{8}_\d{6})_(.+)$')
+		imported = 0
+		if not os.path.isdir(self.directory):
+			return imported
+		with self.lock:
+			snapshots = self._read_index()
+			known = {(snapshot['name'], snapshot['hash']) for snapshot in snapshots}
+			for file_name in sorted(os.listdir(self.directory)):
+				match = pattern.match(file_name)
+				file_path = os.path.join(self.directory, file_name)
+				if match is None or not os.path.isfile(file_path):
+					continue
+				with open(file_path, 'rb') as f:
+					content = f.read()
+				digest = hashlib.sha256(content).hexdigest()
+				name = match.group(2)
+				if (name, digest) not in known:
+					object_path = self._object_path(digest)
+					if not os.path.exists(object_path):
+						os.makedirs(os.path.dirname(object_path), exist_ok=True)
+						with open(object_path, 'wb') as f:
+							f.write(gzip.compress(content))
+					time = datetime.strptime(match.group(1), '%Y%m%d_%H%M%S')
+					snapshots.append({
+						'id': self._unique_id(f"{match.group(1)}_{digest[:12]}", snapshots),
+						'name': name,
+						'time': time.isoformat(timespec='seconds'),
+						'hash': digest,
+						'size': len(content),
+					})
+					known.add((name, digest))
+				imported += 1
+				if remove:
+					os.remove(file_path)
+			snapshots.sort(key=lambda snapshot: snapshot['time'])
+			atomic_write(os.path.join(self.directory, self.INDEX), lambda f: f.writelines(json.dumps(snapshot, ensure_ascii=False) + '\n' for snapshot in snapshots))
+		return imported
@@ -0,0 +1,164 @@
+import argparse
+import base64
+import json
+import os
+import threading
+from array import array
+from datetime import date, timedelta
+
+# Precompiled calendars, see build_calendars
+CALENDARS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'trading_calendars.json')
+
+# Exchanges built by build_calendars: name -> pandas_market_calendars calendar, None for markets open every day
+EXCHANGES = {
+	'SSE': 'XSHG',
+	'NYSE': 'NYSE',
+	'CRYPTO': None,
+}
+
+# Holidays (month, day) on weekdays per year, to rebuild the calendars without pandas_market_calendars (--from-holidays)
+HOLIDAYS = {
+	'SSE': {
+		2025: [(1, 1), (1, 28), (1, 29), (1, 30), (1, 31), (2, 3), (2, 4), (4, 4), (5, 1), (5, 2), (5, 5), (6, 2), (10, 1), (10, 2), (10, 3), (10, 6), (10, 7), (10, 8)],
+		2026: [(1, 1), (1, 2), (2, 16), (2, 17), (2, 18), (2, 19), (2, 20), (2, 23), (4, 6), (5, 1), (5, 4), (5, 5), (6, 19), (9, 25), (10, 1), (10, 2), (10, 5), (10, 6), (10, 7)]
+	},
+	'NYSE': {
+		2025: [(1, 1), (1, 9), (1, 20), (2, 17), (4, 18), (5, 26), (6, 19), (7, 4), (9, 1), (11, 27), (12, 25)],
+		2026: [(1, 1), (1, 19), (2, 16), (4, 3), (5, 25), (6, 19), (7, 3), (9, 7), (11, 26), (12, 25)]
+	},
+}
+
+# Exchanges sharing the calendar of another
+ALIASES = {
+	'SZSE': 'SSE',
+}
+
+class TradingCalendar:
+	"""
+	Trading days of an exchange between start and end, as a bitset with one bit per calendar day.
+
+	ranks[i] counts the trading days before day i and ordinals lists the trading days by index,
+	so membership, previous/next trading day and trading day counts are all answered in O(1).
+	Dates outside start..end raise ValueError, rebuild the calendars to extend them.
+	"""
+
+	def __init__(self, name: str, start: date, end: date, bits: bytes):
+		self.name = name
+		self.start = start
+		self.end = end
+		self.start_ordinal = start.toordinal()
+		self.days = end.toordinal() - self.start_ordinal + 1
+		self.bits = bits
+		self.ranks = array('I', [0]) * (self.days + 1)
+		self.ordinals = array('I')
+		for i in range(self.days):
+			if bits[i >> 3] >> (i & 7) & 1:
+				self.ordinals.append(i)
+			self.ranks[i + 1] = len(self.ordinals)
+
+	@classmethod
+	def from_days(cls, name: str, start: date, end: date, is_trading_day) -> 'TradingCalendar':
+		"""Build a calendar by calling is_trading_day(date) for every day from start to end."""
+		days = end.toordinal() - start.toordinal() + 1
+		bits = bytearray((days + 7) // 8)
+		for i in range(days):
+			if is_trading_day(start + timedelta(days=i)):
+				bits[i >> 3] |= 1 << (i & 7)
+		return cls(name, start, end, bytes(bits))
+
+	def to_json(self) -> dict:
+		return {
+			'start': self.start.isoformat(),
+			'end': self.end.isoformat(),
+			'bits': base64.b64encode(self.bits).decode('ascii'),
+		}
+
+	@classmethod
+	def from_json(cls, name: str, data: dict) -> 'TradingCalendar':
+		return cls(name, date.fromisoformat(data['start']), date.fromisoformat(data['end']), base64.b64decode(data['bits']))
+
+	def _index(self, day: date) -> int:
+		i = day.toordinal() - self.start_ordinal
+		if not 0 <= i < self.days:
+			raise ValueError(f"{day} is outside the {self.name} calendar ({self.start} to {self.end}), rebuild {os.path.basename(CALENDARS_FILE)} to extend it.")
+		return i
+
+	def _day(self, k: int) -> date:
+		if not 0 <= k < len(self.ordinals):
+			raise ValueError(f"The trading day is outside the {self.name} calendar ({self.start} to {self.end}), rebuild {os.path.basename(CALENDARS_FILE)} to extend it.")
+		return date.fromordinal(self.start_ordinal + self.ordinals[k])
+
+	def is_trading_day(self, day: date) -> bool:
+		i = self._index(day)
+		return bool(self.bits[i >> 3] >> (i & 7) & 1)
+
+	def previous(self, day: date, include_given_day: bool = False) -> date:
+		i = self._index(day)
+		return self._day(self.ranks[i + 1 if include_given_day else i] - 1)
+
+	def next(self, day: date, include_given_day: bool = False) -> date:
+		i = self._index(day)
+		return self._day(self.ranks[i if include_given_day else i + 1])
+
+	def shift(self, day: date, n: int) -> date:
+		"""The n-th trading day after day, or before it if n is negative."""
+		i = self._index(day)
+		if n >= 0:
+			return self._day(self.ranks[i + 1] + n - 1) if n else day
+		return self._day(self.ranks[i] + n)
+
+	def trading_days_between(self, start: date, end: date) -> int:
+		"""Number of trading days d with start <= d < end, negative if end is before start."""
+		return self.ranks[self._index(end)] - self.ranks[self._index(start)]
+
+_calendars: dict[str, TradingCalendar] = {}
+_data: dict | None = None
+_lock = threading.Lock()
+
+def get_calendar(name: str) -> TradingCalendar:
+	"""The calendar of an exchange, decoded from the precompiled calendars on first use."""
+	global _data
+	name = ALIASES.get(name, name)
+	calendar = _calendars.get(name)
+	if calendar is not None:
+		return calendar
+	with _lock:
+		if _data is None:
+			with open(CALENDARS_FILE, 'r', encoding='utf-8') as f:
+				_data = json.load(f)
+		if name not in _data:
+			raise ValueError(f"No trading calendar for {name}, add it to EXCHANGES and rebuild {os.path.basename(CALENDARS_FILE)}.")
+		calendar = _calendars[name] = TradingCalendar.from_json(name, _data[name])
+		return calendar
+
+def build_calendars(start: date, end: date, exchanges: dict[str, str | None] = EXCHANGES, file_path: str = CALENDARS_FILE, from_holidays: bool = False):
+	"""
+	Precompile the calendars of exchanges from start to end, with pandas_market_calendars,
+	or with from_holidays from HOLIDAYS for the years it covers.
+	"""
+	calendars = {}
+	for name, market_calendar in exchanges.items():
+		calendar_start, calendar_end = start, end
+		if market_calendar is None:
+			is_trading_day = lambda day: True
+		elif from_holidays:
+			year_holidays = HOLIDAYS[name]
+			calendar_start, calendar_end = max(start, date(min(year_holidays), 1, 1)), min(end, date(max(year_holidays), 12, 31))
+			is_trading_day = lambda day, year_holidays=year_holidays: day.weekday() < 5 and (day.month, day.day) not in year_holidays[day.year]
+		else:
+			import pandas_market_calendars as mcal
+			sessions = set(mcal.get_calendar(market_calendar).valid_days(start_date=start.isoformat(), end_date=end.isoformat()).date)
+			is_trading_day = sessions.__contains__
+		calendars[name] = TradingCalendar.from_days(name, calendar_start, calendar_end, is_trading_day).to_json()
+	with open(file_path, 'w', encoding='utf-8') as f:
+		json.dump(calendars, f, indent='\t')
+		f.write('\n')
+
+if __name__ == '__main__':
+	# python -m utils.trading_calendar --start 2000 --end 2035, from the src directory
+	parser = argparse.ArgumentParser(description="Precompile the trading calendars")
+	parser.add_argument("--start", type=int, help="First year", default=date.today().year - 10)
+	parser.add_argument("--end", type=int, help="Last year", default=date.today().year + 5)
+	parser.add_argument("--from-holidays", action="store_true", help="Use HOLIDAYS instead of pandas_market_calendars")
+	args = parser.parse_args()
+	build_calendars(date(args.start, 1, 1), date(args.end, 12, 31), from_holidays=args.from_holidays)
@@ -1,5 +1,10 @@
+import logging
 from datetime import date, datetime, timedelta
 from pytz import timezone
+from utils.trading_calendar import HOLIDAYS, get_calendar
+
+logger = logging.getLogger('portfolio_rebalancer.trading_day')
+_outside_calendars = set()
 
 def gen_holidays(year: int, calendar_name: str = "NYSE"):
 	import pandas as pd
@@ -8,41 +13,69 @@ def gen_holidays(year: int, calendar_name: str = "NYSE"):
 	all_weekdays = pd.date_range(start=f"{year}-01-01", end=f"{year}-12-31", freq="B")
 	return [(d.date().month, d.date().day) for d in all_weekdays if d.date() not in set(schedule.index.date)]
 
-holidays = {
-	2025: [(1, 1), (1, 28), (1, 29), (1, 30), (1, 31), (2, 3), (2, 4), (4, 4), (5, 1), (5, 2), (5, 5), (6, 2), (10, 1), (10, 2), (10, 3), (10, 6), (10, 7), (10, 8)],
-	2026: [(1, 1), (1, 2), (2, 16), (2, 17), (2, 18), (2, 19), (2, 20), (2, 23), (4, 6), (5, 1), (5, 4), (5, 5), (6, 19), (9, 25), (10, 1), (10, 2), (10, 5), (10, 6), (10, 7)]
-}
+# Holiday lists the precompiled calendars were built from, the functions below use the calendars
+holidays = HOLIDAYS['SSE']
+us_holidays = HOLIDAYS['NYSE']
 
-us_holidays = {
-	2025: [(1, 1), (1, 9), (1, 20), (2, 17), (4, 18), (5, 26), (6, 19), (7, 4), (9, 1), (11, 27), (12, 25)],
-	2026: [(1, 1), (1, 19), (2, 16), (4, 3), (5, 25), (6, 19), (7, 3), (9, 7), (11, 26), (12, 25)]
-}
+def _outside_calendar(error: ValueError, us: bool):
+	"""Dates outside the precompiled calendars fall back to weekdays rather than fail, warned about once per exchange."""
+	name = 'NYSE' if us else 'SSE'
+	if name not in _outside_calendars:
+		_outside_calendars.add(name)
+		logger.warning(f"{error} Assuming every weekday is a trading day.")
 
 def get_previous_trading_day(date: date, include_given_day: bool = False, us: bool = False) -> date:
-	trade_date = date - timedelta(days=1) if not include_given_day else date
-	year_holidays = (holidays if not us else us_holidays).get(trade_date.year, None)
-	if year_holidays is None:
-		raise ValueError(f"Year {trade_date.year} not provided in holidays, please add it to the holidays dictionary.")
-	while True:
-		if trade_date.weekday() < 5 and (trade_date.month, trade_date.day) not in year_holidays:
-			return trade_date
-		trade_date -= timedelta(days=1)
+	try:
+		return get_calendar('NYSE' if us else 'SSE').previous(date, include_given_day)
+	except ValueError as e:
+		_outside_calendar(e, us)
+	day = date if include_given_day else date - timedelta(days=1)
+	while day.weekday() >= 5:
+		day -= timedelta(days=1)
+	return day
 
 def get_next_trading_day(date: date, include_given_day: bool = False, us: bool = False) -> date:
-	trade_date = date + timedelta(days=1) if not include_given_day else date
-	year_holidays = (holidays if not us else us_holidays).get(trade_date.year, None)
-	if year_holidays is None:
-		raise ValueError(f"Year {trade_date.year} not provided in holidays, please add it to the holidays dictionary.")
-	while True:
-		if trade_date.weekday() < 5 and (trade_date.month, trade_date.day) not in year_holidays:
-			return trade_date
-		trade_date += timedelta(days=1)
+	try:
+		return get_calendar('NYSE' if us else 'SSE').next(date, include_given_day)
+	except ValueError as e:
+		_outside_calendar(e, us)
+	day = date if include_given_day else date + timedelta(days=1)
+	while day.weekday() >= 5:
+		day += timedelta(days=1)
+	return day
 
 def is_trading_day(date: date, us: bool = False) -> bool:
-	year_holidays = (holidays if not us else us_holidays).get(date.year, None)
-	if year_holidays is None:
-		raise ValueError(f"Year {date.year} not provided in holidays, please add it to the holidays dictionary.")
-	return date.weekday() < 5 and (date.month, date.day) not in year_holidays
+	try:
+		return get_calendar('NYSE' if us else 'SSE').is_trading_day(date)
+	except ValueError as e:
+		_outside_calendar(e, us)
+	return date.weekday() < 5
+
+def trading_days_between(start: date, end: date, us: bool = False) -> int:
+	"""Number of trading days from start (included) to end (excluded)."""
+	return get_calendar('NYSE' if us else 'SSE').trading_days_between(start, end)
+
+def get_latest_china_trading_day(now: datetime | None = None) -> date:
+	"""The trading day whose closing data is the latest to expect, it moves on at 15:00."""
+	now = now or datetime.now()
+	return get_previous_trading_day((now + timedelta(hours=-15)).date(), True, False)
+
+def get_latest_us_trading_day(now: datetime | None = None) -> date:
+	now = (now or datetime.now()).astimezone(timezone('US/Eastern'))
+	return get_previous_trading_day((now + timedelta(hours=-16)).date(), True, True)
+
+def get_latest_crypto_day(now: datetime | None = None) -> date:
+	now = now or datetime.now()
+	return (now + timedelta(hours=-15)).date()
+
+def refresh_latest_trading_days():
+	"""Recompute the latest trading days, for processes running across a trading day boundary."""
+	global latest_china_trading_day, latest_us_trading_day, latest_crypto_day
+	now = datetime.now()
+	latest_china_trading_day = get_latest_china_trading_day(now)
+	latest_us_trading_day = get_latest_us_trading_day(now)
+	latest_crypto_day = get_latest_crypto_day(now)
 
-latest_china_trading_day = get_previous_trading_day((datetime.now() + timedelta(hours=-15)).date(), True, False)
-latest_us_trading_day = get_previous_trading_day((datetime.now(timezone('US/Eastern')) + timedelta(hours=-16)).date(), True, True)
+latest_china_trading_day = get_latest_china_trading_day()
+latest_us_trading_day = get_latest_us_trading_day()
+latest_crypto_day = get_latest_crypto_day()